@@ -0,0 +1,454 @@
+import argparse
+import builtins
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+import workout_planner
+
+
+# what BaseExercise looked like before it had __slots__ (one __dict__ per exercise), so the comparison is against the old list of objects
+class DictExercise:
+    # constructor
+    def __init__(self, name, muscle_group, equipment_type):
+        self.name = name
+        self.muscle_group = muscle_group
+        self.equipment_type = equipment_type
+
+
+# the real equipment types first (so the scoring tables have something to score), then made up ones if more are asked for
+def synthetic_equipment(equipment_types):
+    real = workout_planner.typesofequipment
+    return real[:equipment_types] + [f"equipment{number}" for number in range(len(real), equipment_types)]
+
+
+# makes made up exercise rows, names are all different and muscle groups / equipment are picked at random
+def synthetic_rows(exercises, muscle_groups=6, equipment_types=4, seed=0):
+    rng = random.Random(seed)
+    groups = [f"group{number}" for number in range(muscle_groups)]
+    equipment = synthetic_equipment(equipment_types)
+    return [(f"exercise{number}", rng.choice(groups), rng.choice(equipment)) for number in range(exercises)]
+
+
+# bytes allocated while building something (the rows already exist so the strings themselves are not counted)
+def allocated_bytes(build, rows):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build(rows)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+    return after - before
+
+
+# how much memory the same catalog takes as the old list of objects, a list of __slots__ objects, and an ExerciseCatalog
+def catalog_memory(exercises):
+    rows = synthetic_rows(exercises)
+    results = {
+        "exercises": exercises,
+        "list_of_dict_objects": allocated_bytes(lambda rows: [DictExercise(*row) for row in rows], rows),
+        "list_of_slots_objects": allocated_bytes(lambda rows: [workout_planner.BaseExercise(*row) for row in rows], rows),
+        "exercise_catalog": allocated_bytes(lambda rows: catalog_from_rows(rows), rows),
+    }
+    results["catalog_vs_dict_objects"] = round(results["list_of_dict_objects"] / results["exercise_catalog"], 2)
+    return results
+
+
+# random answers for every question, picked from the options the questionnaire allows
+def synthetic_profiles(profiles, seed=0):
+    rng = random.Random(seed)
+    return [{question: rng.choice(options) for question, _, options in workout_planner.questionnaire} for _ in range(profiles)]
+
+
+# scores every profile against every exercise with numpy, and a sample of profiles the old way to estimate how long that would take
+# (the full scalar run at 10k x 10k is 100 million calls, so it is measured on a slice and scaled up)
+def vectorized_scoring(profiles, exercises, scalar_sample):
+    catalog = workout_planner.ExerciseCatalog(workout_planner.BaseExercise(*row) for row in synthetic_rows(exercises))
+    answer_sets = synthetic_profiles(profiles)
+    scoring = workout_planner.planner_core().scoring
+
+    start = time.perf_counter()
+    matrix = workout_planner.vectorized_score_matrix(answer_sets, catalog, scoring)
+    vectorized_seconds = time.perf_counter() - start
+
+    exercise_list = list(catalog)
+    sample = answer_sets[:scalar_sample]
+    start = time.perf_counter()
+    scalar_rows = [[workout_planner.scoring_every_exercise(ex, answers, scoring) for ex in exercise_list] for answers in sample]
+    scalar_seconds = time.perf_counter() - start
+    scalar_estimate = scalar_seconds * profiles / len(sample)
+
+    return {
+        "profiles": profiles,
+        "exercises": exercises,
+        "vectorized_seconds": round(vectorized_seconds, 4),
+        "scalar_sample_profiles": len(sample),
+        "scalar_sample_seconds": round(scalar_seconds, 4),
+        "scalar_estimated_seconds": round(scalar_estimate, 2),
+        "speedup": round(scalar_estimate / vectorized_seconds, 1),
+        "matches_scalar": all(matrix[row].tolist() == scalar_rows[row] for row in range(len(sample))),
+    }
+
+
+# adds rows one at a time like a loader would, then drops the build only name lookup
+def catalog_from_rows(rows):
+    catalog = workout_planner.ExerciseCatalog()
+    for row in rows:
+        catalog.add(*row)
+    catalog.compact()
+    return catalog
+
+
+# runs every profile through plan, repeats times, and gives back the fastest round in seconds (the slower rounds are the machine doing something else)
+def fastest(repeats, answer_sets, plan):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for answers in answer_sets:
+            plan(answers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# times every hot path over all the profiles for one synthetic catalog size
+# the old dp walks every path through the muscle groups, so it is only run when that number of paths is small enough to finish
+def hot_paths(exercises, muscle_groups, equipment_types, profiles, dp_max_paths, repeats=3, seed=0):
+    catalog = [workout_planner.BaseExercise(*row) for row in synthetic_rows(exercises, muscle_groups, equipment_types, seed)]
+    answer_sets = [workout_planner.normalize_answers(answers) for answers in synthetic_profiles(profiles, seed)]
+    scoring = workout_planner.planner_core().scoring
+    groups = workout_planner.getgroups(catalog)
+
+    # the exercise a replacement is asked for in every group (the first one, like the circuit would have picked something there)
+    first_in_group = {}
+    for ex in catalog:
+        first_in_group.setdefault(ex.muscle_group, ex.name)
+
+    # scoring every exercise
+    def score_all(answers):
+        for ex in catalog:
+            workout_planner.scoring_every_exercise(ex, answers, scoring)
+
+    # adding up the points per equipment type and picking the best one
+    def tally(answers):
+        workout_planner.best_equipment_for(workout_planner.equipment_scores(answers, scoring))
+
+    # one replacement per muscle group
+    def replace_all(answers):
+        for group in groups:
+            workout_planner.get_second_best(catalog, answers, scoring, group, first_in_group[group])
+
+    scoring_seconds = fastest(repeats, answer_sets, score_all)
+    results = {
+        "exercises": exercises,
+        "muscle_groups": muscle_groups,
+        "equipment_types": equipment_types,
+        "profiles": profiles,
+        "scoring_every_exercise_seconds": round(scoring_seconds, 6),
+        "scoring_every_exercise_ns_per_call": round(scoring_seconds * 1e9 / max(1, profiles * exercises), 1),
+        "best_equipment_tally_seconds": round(fastest(repeats, answer_sets, tally), 6),
+        "get_second_best_seconds": round(fastest(repeats, answer_sets, replace_all), 6),
+        # the counts dp, for comparing against the old one
+        "optimalcircuitwithcounts_seconds": round(fastest(repeats, answer_sets, lambda answers: workout_planner.optimalcircuitwithcounts(catalog, answers, scoring)), 6),
+    }
+
+    # the old dp, with how its lru_cache did added up over every profile
+    per_group = {}
+    for ex in catalog:
+        per_group[ex.muscle_group] = per_group.get(ex.muscle_group, 0) + 1
+    paths = math.prod(per_group.values())
+    results["optimalcircuitwithdp_paths"] = paths
+    if paths > dp_max_paths:
+        results["optimalcircuitwithdp_seconds"] = None
+        return results
+
+    cache = {"hits": 0, "misses": 0, "entries": 0}
+    def old_dp(answers):
+        stats = {}
+        workout_planner.optimalcircuitwithdp(catalog, answers, scoring, stats)
+        cache["hits"] += stats["hits"]
+        cache["misses"] += stats["misses"]
+        cache["entries"] = max(cache["entries"], stats["entries"])
+
+    results["optimalcircuitwithdp_seconds"] = round(fastest(repeats, answer_sets, old_dp), 6)
+    results["dp_cache_hit_rate"] = round(cache["hits"] / max(1, cache["hits"] + cache["misses"]), 4)
+    results["dp_cache_entries"] = cache["entries"]
+    return results
+
+
+# every timing in results that got slower than tolerance times the same size in the baseline file
+# timings under min_seconds in the baseline are mostly noise, so they are left out
+def hot_path_regressions(results, baseline, tolerance, min_seconds=0.001):
+    size = lambda run: (run["exercises"], run["muscle_groups"], run["equipment_types"], run["profiles"])
+    baseline_runs = {size(run): run for run in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        old = baseline_runs.get(size(run))
+        if old is None:
+            continue
+        for key, seconds in run.items():
+            if key.endswith("_seconds") and seconds is not None and old.get(key) and old[key] >= min_seconds:
+                if seconds > old[key] * tolerance:
+                    regressions.append({"size": size(run), "timing": key, "baseline": old[key], "now": seconds})
+    return regressions
+
+
+# plans every profile the way main does (score stage, optimalcircuitwithcounts, one replacement per muscle group from RankedAlternatives)
+# plus kbest_circuits for its CountsTable, with PlannerMetrics on, and gives back what it measured
+# old_dp also runs the old optimalcircuitwithdp and get_second_best (slow past a few dozen exercises)
+def dp_profile(exercises, muscle_groups, equipment_types, profiles, track_memory, seed=0, kbest=3, old_dp=True):
+    catalog = [workout_planner.BaseExercise(*row) for row in synthetic_rows(exercises, muscle_groups, equipment_types, seed)]
+    answer_sets = [workout_planner.normalize_answers(answers) for answers in synthetic_profiles(profiles, seed)]
+    scoring = workout_planner.planner_core().scoring
+    groups = workout_planner.getgroups(catalog)
+
+    with workout_planner.PlannerMetrics(track_memory=track_memory) as metrics:
+        for answers in answer_sets:
+            scores = workout_planner.exercise_score_array(catalog, workout_planner.equipment_scores(answers, scoring))
+            circuit = workout_planner.optimalcircuitwithcounts(catalog, answers, scoring, scores)
+            alternatives = workout_planner.RankedAlternatives(catalog, scores)
+            for ex in circuit:
+                alternatives.mark_used(ex)
+            for ex in circuit:
+                alternatives.next_alternative(ex.muscle_group)
+            if kbest:
+                list(workout_planner.kbest_circuits(catalog, answers, scoring, k=kbest, scores=scores))
+
+            if old_dp:
+                circuit = workout_planner.optimalcircuitwithdp(catalog, answers, scoring)
+                for ex in circuit:
+                    workout_planner.get_second_best(catalog, answers, scoring, ex.muscle_group, ex.name)
+
+    report = metrics.report()
+    report.update(exercises=exercises, muscle_groups=len(groups), equipment_types=equipment_types, profiles=profiles)
+    return report
+
+
+# plans the same profiles with recommend_many_parallel for every number of workers and chunk size, and how much faster than one worker each was
+# a made up catalog (exercises > 0) makes every plan cost more, so more of the time is the part that actually runs in parallel
+def bulk_throughput(profiles, workers_list, chunksizes, exercises=0, muscle_groups=6, equipment_types=4, seed=0):
+    if exercises:
+        catalog = catalog_from_rows(synthetic_rows(exercises, muscle_groups, equipment_types, seed))
+    else:
+        catalog = workout_planner.planner_core().catalog
+    answer_sets = synthetic_profiles(profiles, seed)
+
+    # the candidates are worked out the first time theyre needed, done here so the first run isnt slower for it (and forked workers get them too)
+    catalog.circuit_candidates()
+
+    runs = []
+    baseline = None
+    expected = None
+    for workers in workers_list:
+        for chunksize in chunksizes:
+            start = time.perf_counter()
+            parent_start = time.process_time()
+            plans = [(best, tuple(ex.row for ex in circuit)) for best, circuit in workout_planner.recommend_many_parallel(answer_sets, catalog, workers=workers, chunksize=chunksize)]
+            parent_cpu = time.process_time() - parent_start
+            seconds = time.perf_counter() - start
+            if expected is None:
+                expected = plans
+            if baseline is None and workers == 1:
+                baseline = seconds
+            runs.append({
+                "workers": workers,
+                "chunksize": chunksize,
+                "seconds": round(seconds, 4),
+                "profiles_per_second": round(profiles / seconds),
+                "speedup": None if baseline is None else round(baseline / seconds, 2),
+                # cpu this process used (slicing, pickling and putting plans back together), the part more workers cant speed up
+                "parent_cpu_seconds": round(parent_cpu, 4),
+                "matches_first_run": plans == expected,
+            })
+    return {"profiles": profiles, "exercises": len(catalog), "cpu_count": os.cpu_count(), "runs": runs}
+
+
+# times the counts table against the assignment solver for every number of muscle groups and equipment types, with how many states the table has
+# the table is skipped once it would have more than table_max_states states at the last muscle group
+def circuit_scaling(exercises, muscle_groups_list, equipment_types_list, table_max_states, seed=0):
+    scoring = workout_planner.planner_core().scoring
+    answers = workout_planner.normalize_answers(synthetic_profiles(1, seed)[0])
+    runs = []
+    for muscle_groups, equipment_types in itertools.product(muscle_groups_list, equipment_types_list):
+        catalog = catalog_from_rows(synthetic_rows(exercises, muscle_groups, equipment_types, seed))
+        candidates = catalog.circuit_candidates()
+        groups = catalog.groups()
+        slot = {equipment: number for number, equipment in enumerate(sorted(catalog.equipment_types))}
+        scores = workout_planner.exercise_score_array(catalog, workout_planner.equipment_scores(answers, scoring))
+        options = [[(catalog[row], slot[equipment], scores[row]) for equipment, row in candidates[group].items()] for group in groups]
+
+        run = {"exercises": exercises, "muscle_groups": len(groups), "equipment_types": len(slot), "table_states": math.comb(len(groups) + len(slot) - 1, len(slot) - 1)}
+        start = time.perf_counter()
+        assigned = workout_planner.CircuitAssignment(options, len(slot)).best_path()
+        run["assignment_seconds"] = round(time.perf_counter() - start, 6)
+        if run["table_states"] > table_max_states:
+            run["table_seconds"] = None
+        else:
+            start = time.perf_counter()
+            table = workout_planner.CountsTable(options, len(slot)).best_path()
+            run["table_seconds"] = round(time.perf_counter() - start, 6)
+            run["same_circuit"] = [ex.row for ex, _, _ in table] == [ex.row for ex, _, _ in assigned]
+        runs.append(run)
+    return runs
+
+
+# the answers typed in for the test cases in README.md, with the best equipment and final circuit python workout_planner.py prints for them
+readme_cases_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "readme_cases.json")
+
+# how the questionnaire prints the best equipment and every exercise
+best_equipment_line = re.compile(r"the best equipment type is: (\S+)")
+exercise_line = re.compile(r"^- (.*) \((.*)\) - Equipment: (.*)$")
+
+
+# types a readme case into python workout_planner.py (asks for questions, answers them as written, asks for the mixed circuit and keeps it)
+# and gives back the best equipment and final circuit it printed
+def replay_readme_case(answers):
+    typed = iter(["y", "questions"] + [answers[question] for question in workout_planner.question_keys] + ["y", "n"])
+    printed = io.StringIO()
+    real_input = builtins.input
+    builtins.input = lambda prompt="": next(typed)
+    try:
+        with contextlib.redirect_stdout(printed):
+            workout_planner.main([])
+    finally:
+        builtins.input = real_input
+
+    output = printed.getvalue()
+    best_equipment = best_equipment_line.search(output)
+    final_circuit = output.split("Final customized circuit:", 1)[-1]
+    circuit = [list(match.groups()) for match in map(exercise_line.match, final_circuit.splitlines()) if match]
+    return (best_equipment.group(1) if best_equipment else None), circuit
+
+
+# replays every readme case through the questionnaire and also plans it with recommend_many, gives back the cases where either doesnt match the fixture
+def check_readme_cases(path=readme_cases_path, update=False):
+    with open(path) as file:
+        cases = json.load(file)
+
+    failures = []
+    for case in cases:
+        best_equipment, circuit = replay_readme_case(case["answers"])
+        batch_equipment, batch_circuit = workout_planner.recommend_many([case["answers"]])[0]
+        batch_circuit = [[ex.name, ex.muscle_group, ex.equipment_type] for ex in batch_circuit]
+
+        if update:
+            case["best_equipment"] = best_equipment
+            case["circuit"] = circuit
+        elif (best_equipment, circuit) != (case["best_equipment"], case["circuit"]) or (batch_equipment, batch_circuit) != (case["best_equipment"], case["circuit"]):
+            failures.append({
+                "case": case["name"],
+                "questionnaire": {"best_equipment": best_equipment, "circuit": circuit},
+                "batch": {"best_equipment": batch_equipment, "circuit": batch_circuit},
+            })
+
+    if update:
+        with open(path, "w") as file:
+            json.dump(cases, file, indent=2)
+            file.write("\n")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks for the workout planner")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    memory = commands.add_parser("catalog-memory", help="compare catalog memory against the list of objects")
+    memory.add_argument("--exercises", type=int, nargs="+", default=[1000, 10000, 100000])
+
+    scoring = commands.add_parser("vectorized-scoring", help="numpy score matrix against the scalar scoring function")
+    scoring.add_argument("--profiles", type=int, default=10000)
+    scoring.add_argument("--exercises", type=int, default=10000)
+    scoring.add_argument("--scalar-sample", type=int, default=50)
+
+    paths = commands.add_parser("hot-paths", help="time the scoring, tally, replacement and dp functions on synthetic catalogs")
+    paths.add_argument("--exercises", type=int, nargs="+", default=[12, 24, 100, 1000, 10000])
+    paths.add_argument("--muscle-groups", type=int, nargs="+", default=[6])
+    paths.add_argument("--equipment-types", type=int, nargs="+", default=[4])
+    paths.add_argument("--profiles", type=int, default=20)
+    paths.add_argument("--dp-max-paths", type=int, default=200000, help="skip optimalcircuitwithdp when it would walk more paths than this")
+    paths.add_argument("--repeats", type=int, default=3, help="time every path this many times and keep the fastest")
+    paths.add_argument("--seed", type=int, default=0)
+    paths.add_argument("--output", default=None, help="write the results here as json (default: print them)")
+    paths.add_argument("--baseline", default=None, help="results from an earlier run, exits with 1 if anything got slower")
+    paths.add_argument("--tolerance", type=float, default=1.5, help="how many times slower than the baseline still counts as fine")
+    paths.add_argument("--min-seconds", type=float, default=0.001, help="dont compare timings that took less than this in the baseline")
+
+    profile = commands.add_parser("dp-profile", help="where a plan spends its time, how big the counts tables get and how big the old dp's memo gets")
+    profile.add_argument("--exercises", type=int, default=24)
+    profile.add_argument("--muscle-groups", type=int, default=6)
+    profile.add_argument("--equipment-types", type=int, default=4)
+    profile.add_argument("--profiles", type=int, default=5)
+    profile.add_argument("--track-memory", action="store_true", help="measure the memo's peak memory with tracemalloc (slow)")
+    profile.add_argument("--kbest", type=int, default=3, help="circuits for kbest_circuits to find (0 skips it and its CountsTable)")
+    profile.add_argument("--skip-old-dp", action="store_true", help="dont run optimalcircuitwithdp and get_second_best (for big catalogs)")
+    profile.add_argument("--seed", type=int, default=0)
+
+    circuits = commands.add_parser("circuit-scaling", help="CountsTable against CircuitAssignment as muscle groups and equipment types grow")
+    circuits.add_argument("--exercises", type=int, default=2000)
+    circuits.add_argument("--muscle-groups", type=int, nargs="+", default=[6, 12, 24, 48])
+    circuits.add_argument("--equipment-types", type=int, nargs="+", default=[4, 6, 8, 16])
+    circuits.add_argument("--table-max-states", type=int, default=300000, help="skip CountsTable when it would have more states than this")
+    circuits.add_argument("--seed", type=int, default=0)
+
+    bulk = commands.add_parser("bulk-throughput", help="profiles per second for recommend_many_parallel with different numbers of workers")
+    bulk.add_argument("--profiles", type=int, default=100000)
+    bulk.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="put 1 first, speedups are against it")
+    bulk.add_argument("--chunksize", type=int, nargs="+", default=[1024], help="profiles per shard sent to a worker")
+    bulk.add_argument("--exercises", type=int, default=0, help="plan against a made up catalog this big (default: the built in exercises)")
+    bulk.add_argument("--muscle-groups", type=int, default=6)
+    bulk.add_argument("--equipment-types", type=int, default=4)
+    bulk.add_argument("--seed", type=int, default=0)
+
+    cases = commands.add_parser("readme-cases", help="check the README test cases against fixtures/readme_cases.json")
+    cases.add_argument("--update", action="store_true", help="rewrite the expected results from the current planner")
+
+    args = parser.parse_args()
+    if args.command == "catalog-memory":
+        for exercises in args.exercises:
+            print(json.dumps(catalog_memory(exercises)))
+    elif args.command == "vectorized-scoring":
+        print(json.dumps(vectorized_scoring(args.profiles, args.exercises, args.scalar_sample)))
+    elif args.command == "hot-paths":
+        results = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "runs": [hot_paths(exercises, groups, equipment, args.profiles, args.dp_max_paths, args.repeats, args.seed) for exercises, groups, equipment in itertools.product(args.exercises, args.muscle_groups, args.equipment_types)],
+        }
+        if args.output is None:
+            print(json.dumps(results, indent=2))
+        else:
+            with open(args.output, "w") as file:
+                json.dump(results, file, indent=2)
+        if args.baseline is not None:
+            with open(args.baseline) as file:
+                regressions = hot_path_regressions(results, json.load(file), args.tolerance, args.min_seconds)
+            for regression in regressions:
+                print(json.dumps(regression), file=sys.stderr)
+            if regressions:
+                sys.exit(1)
+    elif args.command == "dp-profile":
+        print(json.dumps(dp_profile(args.exercises, args.muscle_groups, args.equipment_types, args.profiles, args.track_memory, args.seed, args.kbest, not args.skip_old_dp), indent=2))
+    elif args.command == "circuit-scaling":
+        for run in circuit_scaling(args.exercises, args.muscle_groups, args.equipment_types, args.table_max_states, args.seed):
+            print(json.dumps(run))
+    elif args.command == "bulk-throughput":
+        print(json.dumps(bulk_throughput(args.profiles, args.workers, args.chunksize, args.exercises, args.muscle_groups, args.equipment_types, args.seed), indent=2))
+    elif args.command == "readme-cases":
+        failures = check_readme_cases(update=args.update)
+        for failure in failures:
+            print(json.dumps(failure))
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
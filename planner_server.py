@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+from collections import OrderedDict
+
+import workout_planner
+
+
+# how many alternatives to send back for every muscle group in the circuit
+alternatives_per_slot = 3
+
+# biggest request body that gets read, a set of answers is way smaller than this
+max_body_bytes = 64 * 1024
+
+
+# every worker process keeps its own copy of the scoring model file, so a task only has to say which model version it wants
+worker_models = None
+
+def init_worker(model_path):
+    global worker_models
+    worker_models = workout_planner.ScoringModelStore(model_path)
+
+# the worker's model if its the version the request was checked against, None if the file changed and this worker has a different one
+def worker_model(model_version):
+    model = worker_models.current()
+    if model.version != model_version and worker_models.reload_if_changed():
+        model = worker_models.model
+    return model if model.version == model_version else None
+
+# works out the whole response for one set of (already checked) answers, runs in a worker process so the dp never blocks the event loop
+# model is only sent along when the worker said it doesnt have model_version (plan_response gave back None)
+# gives back the json bytes so the event loop doesnt have to serialize it either
+def plan_response(answers, model_version, model=None):
+    if model is None:
+        model = worker_model(model_version)
+        if model is None:
+            return None
+    core = workout_planner.planner_core()
+    equipment_points = model.equipment_scores(answers)
+    scores = workout_planner.exercise_score_array(core.catalog, equipment_points)
+    circuit = workout_planner.optimalcircuitwithcounts(core.catalog, answers, model.tables, scores)
+
+    # ranked alternatives for every slot, skipping whatever is already in the circuit
+    alternatives = workout_planner.RankedAlternatives(core.catalog, scores)
+    for ex in circuit:
+        alternatives.mark_used(ex)
+    ranked = {}
+    for ex in circuit:
+        ranked[ex.muscle_group] = []
+        for _ in range(alternatives_per_slot):
+            alternative = alternatives.next_alternative(ex.muscle_group)
+            if alternative is None:
+                break
+            ranked[ex.muscle_group].append(exercise_to_dict(alternative))
+
+    response = workout_planner.plan_to_dict((workout_planner.best_equipment_for(equipment_points), circuit))
+    response["answers"] = answers
+    response["alternatives"] = ranked
+    response["model_version"] = model_version
+    return json.dumps(response).encode()
+
+
+def exercise_to_dict(ex):
+    return {"name": ex.name, "muscle_group": ex.muscle_group, "equipment_type": ex.equipment_type}
+
+
+# least recently used cache with a fixed number of entries, keyed by the normalized answers
+class ResultCache:
+    # constructor
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+# the recommendation service: checks the answers, answers from the cache when it can, otherwise runs the planner in the pool
+class PlannerService:
+    # constructor
+    def __init__(self, workers=None, cache_size=4096, model_path=None):
+        self.cache = ResultCache(cache_size)
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(model_path,))
+
+        # scoring model from the file, swapped in when the file changes, responses are cached per model version
+        self.models = workout_planner.ScoringModelStore(model_path)
+        self.cache_version = self.models.model.version
+
+        # requests for the same answers that came in while the first one is still being planned wait on the same future
+        self.in_flight = {}
+
+    # gives back (status, body bytes) for a POST /recommend body
+    async def recommend(self, body):
+        try:
+            useranswers = json.loads(body)
+            if not isinstance(useranswers, dict):
+                raise ValueError("the body has to be a json object of useranswers")
+            answers = workout_planner.normalize_answers(useranswers)
+        except ValueError as error:
+            return 400, json.dumps({"error": str(error)}).encode()
+
+        # one model for the whole request, a new model means none of the cached responses are any good anymore
+        model = self.models.current()
+        if model.version != self.cache_version:
+            self.cache.entries.clear()
+            self.cache_version = model.version
+
+        key = (model.version,) + tuple(answers[question] for question in workout_planner.question_keys)
+        response = self.cache.get(key)
+        if response is not None:
+            return 200, response
+
+        future = self.in_flight.get(key)
+        if future is None:
+            future = self.in_flight[key] = asyncio.ensure_future(self.plan(answers, model))
+            future.add_done_callback(lambda done: self.finished(key, done))
+
+        # shielded so a client hanging up doesnt cancel the plan for everyone else waiting on it
+        return 200, await asyncio.shield(future)
+
+    # runs plan_response in the pool, the worker reads the model from its own copy of the file
+    # if the file changed between this request and the worker checking it, the worker gets this model sent along instead
+    async def plan(self, answers, model):
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self.executor, plan_response, answers, model.version)
+        if response is None:
+            response = await loop.run_in_executor(self.executor, plan_response, answers, model.version, model)
+        return response
+
+    # a plan finished, cache it (even if whoever asked first is gone) unless the model changed in the meantime
+    def finished(self, key, future):
+        del self.in_flight[key]
+        if not future.cancelled() and future.exception() is None and key[0] == self.cache_version:
+            self.cache.put(key, future.result())
+
+    # cache numbers for GET /stats
+    def stats(self):
+        return json.dumps({
+            "model_version": self.models.model.version,
+            "model_error": None if self.models.last_error is None else str(self.models.last_error),
+            "cache_entries": len(self.cache.entries),
+            "cache_max_entries": self.cache.max_entries,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+        }).encode()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+status_text = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# picks what to do for a request, gives back (status, body bytes)
+async def route(service, method, path, body):
+    if path == "/recommend":
+        if method != "POST":
+            return 405, json.dumps({"error": "use POST"}).encode()
+        return await service.recommend(body)
+    if path == "/health":
+        return 200, b'{"status": "ok"}'
+    if path == "/stats":
+        return 200, service.stats()
+    return 404, json.dumps({"error": "not found"}).encode()
+
+
+# reads http/1.1 requests off one connection (keep-alive) and writes back json responses
+async def handle_connection(service, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            except ValueError:
+                break
+
+            # headers until the blank line
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            # a length that isnt a whole number means theres no telling where the body ends, so answer and close
+            length = headers.get("content-length", "") or "0"
+            if not (length.isascii() and length.isdigit()):
+                status, body = 400, json.dumps({"error": f"bad Content-Length {length!r}"}).encode()
+                keep_alive = False
+            elif int(length) > max_body_bytes:
+                status, body = 413, json.dumps({"error": "request body too large"}).encode()
+                keep_alive = False
+            else:
+                length = int(length)
+                request_body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, body = await route(service, method, path, request_body)
+                except Exception as error:
+                    status, body = 500, json.dumps({"error": f"{type(error).__name__}: {error}"}).encode()
+
+            writer.write(
+                f"HTTP/1.1 {status} {status_text[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, workers, cache_size, ready=None, model_path=None):
+    service = PlannerService(workers, cache_size, model_path)
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(service, reader, writer), host, port)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="workout planner recommendation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="planner processes (default: one per core)")
+    parser.add_argument("--cache-size", type=int, default=4096, help="how many answer sets to keep responses for")
+    parser.add_argument("--model", default=None, help="scoring model file (default: scoring_model.json next to workout_planner.py), reloaded when it changes")
+    args = parser.parse_args()
+
+    def ready(port):
+        print(f"listening on http://{args.host}:{port}", flush=True)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.cache_size, ready, args.model))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
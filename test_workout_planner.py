@@ -0,0 +1,356 @@
+import itertools
+import json
+import random
+import time
+
+import pytest
+
+import planner_bench
+import planner_server
+import workout_planner
+
+
+# the README test cases typed into the questionnaire (and planned with recommend_many) still give the saved plans
+def test_readme_cases():
+    assert planner_bench.check_readme_cases() == []
+
+
+# the assignment solver picks the same exercises as the counts table, ties included (scores 0-2 so there are lots of ties)
+def test_circuit_assignment_matches_counts_table():
+    chance = random.Random(7)
+    for _ in range(1000):
+        equipment_count = chance.randint(1, 10)
+        options = [[((group, pick), chance.randrange(equipment_count), chance.randint(0, 2)) for pick in range(chance.randint(1, 6))] for group in range(chance.randint(0, 9))]
+        table = [ex for ex, _, _ in workout_planner.CountsTable(options, equipment_count).best_path()]
+        assert [ex for ex, _, _ in workout_planner.CircuitAssignment(options, equipment_count).best_path()] == table
+
+
+# optimalcircuitwithcounts still gives the same circuit as the original dp on small random catalogs
+def test_optimalcircuitwithcounts_matches_dp():
+    scoring = workout_planner.planner_core().scoring
+    chance = random.Random(11)
+    for trial in range(100):
+        rows = planner_bench.synthetic_rows(chance.randint(1, 22), chance.randint(1, 5), chance.randint(1, 6), seed=trial)
+        exercises = [workout_planner.BaseExercise(*row) for row in rows]
+        answers = workout_planner.normalize_answers(planner_bench.synthetic_profiles(1, seed=trial)[0])
+        dp = [ex.name for ex in workout_planner.optimalcircuitwithdp(exercises, answers, scoring)]
+        assert [ex.name for ex in workout_planner.optimalcircuitwithcounts(exercises, answers, scoring)] == dp
+
+
+# scoring_model.json is where the weights get tuned, a hand edited file is what gets used and the scoring_for_* tables are only the fallback
+def test_scoring_model_file_is_the_source(tmp_path):
+    with open(workout_planner.scoring_model_path) as file:
+        data = json.load(file)
+    data["questions"]["home_gym"]["Gym"]["machine"] = 9
+    path = tmp_path / "scoring_model.json"
+    path.write_text(json.dumps(data))
+    model = workout_planner.load_scoring_model(str(path))
+    assert model.tables["home_gym"]["Gym"]["machine"] == 9
+    assert model.version != workout_planner.load_scoring_model().version
+
+    answers = workout_planner.normalize_answers(planner_bench.synthetic_profiles(1)[0])
+    answers["home_gym"] = "Gym"
+    points = workout_planner.equipment_scores(answers, model.tables)
+    assert model.equipment_scores(answers) == {equipment: points.get(equipment, 0) for equipment in workout_planner.typesofequipment}
+
+    assert workout_planner.load_scoring_model(str(tmp_path / "missing.json")).tables == workout_planner.default_scoring_tables
+
+
+# server workers score with their own copy of the model and only plan for the version the request was checked against
+def test_server_workers_use_the_requested_model_version():
+    planner_server.init_worker(None)
+    model = workout_planner.load_scoring_model()
+    answers = workout_planner.normalize_answers(planner_bench.synthetic_profiles(1)[0])
+    response = json.loads(planner_server.plan_response(answers, model.version))
+    assert response["model_version"] == model.version
+    assert planner_server.plan_response(answers, "0-stale") is None
+    assert planner_server.plan_response(answers, model.version, model) == planner_server.plan_response(answers, model.version)
+
+
+# a mistyped option exits with an error instead of starting the questionnaire
+def test_main_rejects_unknown_options():
+    with pytest.raises(SystemExit) as exited:
+        workout_planner.main(["--batch", "answers.jsonl", "--cahce", "plans.sqlite3"])
+    assert exited.value.code == 2
+
+
+# the worker pool hands back the same plans as recommend_many, in the same order, for shards that repeat answers across workers
+def test_recommend_many_parallel_matches_recommend_many():
+    profiles = planner_bench.synthetic_profiles(3000, seed=3)
+    expected = [(best, [ex.name for ex in circuit]) for best, circuit in workout_planner.recommend_many(profiles)]
+    plans = workout_planner.recommend_many_parallel(profiles, workers=2, chunksize=64)
+    assert [(best, [ex.name for ex in circuit]) for best, circuit in plans] == expected
+    assert workout_planner.bulk_worker_state == {}
+
+
+# importing stays cheap (nothing gets built until something needs it)
+def test_import_time_budget():
+    assert workout_planner.measure_import_time() < workout_planner.import_time_budget_ms
+
+
+# after any mix of answer changes, pins and replacements a session has the same circuit as planning from scratch
+# (a pinned slot is the same as a catalog where that muscle group only has the pinned exercise)
+def test_planner_session_matches_fresh_plan():
+    scoring = workout_planner.planner_core().scoring
+    chance = random.Random(5)
+    for trial in range(30):
+        rows = planner_bench.synthetic_rows(chance.randint(5, 200), chance.randint(1, 8), chance.randint(1, 6), seed=trial)
+        exercises = [workout_planner.BaseExercise(*row) for row in rows]
+        answers = workout_planner.normalize_answers(planner_bench.synthetic_profiles(1, seed=trial)[0])
+        session = workout_planner.PlannerSession(answers, exercises, scoring)
+        pins = {}
+        for _ in range(20):
+            step = chance.random()
+            index = chance.randrange(len(session.muscle_groups))
+            muscle = session.muscle_groups[index]
+            if step < 0.4:
+                question, _, options = chance.choice(workout_planner.questionnaire)
+                answer = chance.choice(options)
+                answers[question] = answer
+                session.change_answer(question, answer.upper())
+            elif step < 0.6:
+                pins[muscle] = chance.choice([ex for ex in exercises if ex.muscle_group == muscle]).name
+                session.pin(index, pins[muscle])
+            elif step < 0.75:
+                pins.pop(muscle, None)
+                session.unpin(index)
+            else:
+                replaced = session.replace(index)
+                if replaced is not None:
+                    pins[muscle] = replaced[index].name
+
+            pinned = [ex for ex in exercises if ex.muscle_group not in pins or ex.name == pins[ex.muscle_group]]
+            fresh = workout_planner.optimalcircuitwithcounts(pinned, answers, scoring)
+            assert [ex.name for ex in session.circuit()] == [ex.name for ex in fresh]
+            assert session.useranswers == answers
+
+
+# session answers are checked and spelled like the questionnaire
+def test_planner_session_checks_answers():
+    answers = workout_planner.normalize_answers(planner_bench.synthetic_profiles(1)[0])
+    session = workout_planner.PlannerSession(answers)
+    session.change_answer("home_gym", "gym")
+    assert session.useranswers["home_gym"] == "Gym"
+    assert session.equipment_points == workout_planner.equipment_scores(session.useranswers, session.scoring)
+    for question, answer in (("home_gym", "Banana"), ("homegym", "Gym")):
+        with pytest.raises(ValueError):
+            session.change_answer(question, answer)
+
+
+# kbest_circuits gives the same top k scores as trying every circuit, with and without equipment and minute caps
+def test_kbest_circuits_matches_brute_force():
+    scoring = workout_planner.planner_core().scoring
+    chance = random.Random(13)
+    for trial in range(150):
+        rows = planner_bench.synthetic_rows(chance.randint(1, 14), chance.randint(1, 4), chance.randint(1, 4), seed=trial)
+        exercises = [workout_planner.BaseExercise(*row) for row in rows]
+        answers = workout_planner.normalize_answers(planner_bench.synthetic_profiles(1, seed=trial)[0])
+        scores = workout_planner.exercise_score_array(exercises, workout_planner.equipment_scores(answers, scoring))
+        equipment_types = sorted(set(ex.equipment_type for ex in exercises))
+        caps = {equipment: chance.randint(0, 2) for equipment in equipment_types if chance.random() < 0.5}
+        minutes = {ex.name: chance.randint(5, 12) for ex in exercises}
+        max_minutes = chance.choice([None, 20, 30])
+        k = chance.randint(1, 6)
+
+        # every circuit, scored the way the dp does it
+        groups = workout_planner.getgroups(exercises)
+        everything = []
+        for picked in itertools.product(*[[position for position, ex in enumerate(exercises) if ex.muscle_group == muscle] for muscle in groups]):
+            used = [exercises[position].equipment_type for position in picked]
+            if any(used.count(equipment) > cap for equipment, cap in caps.items()):
+                continue
+            if max_minutes is not None and sum(minutes[exercises[position].name] for position in picked) > max_minutes:
+                continue
+            everything.append(sum(scores[position] - 2 * used[:slot].count(used[slot]) for slot, position in enumerate(picked)))
+        expected = sorted(everything, reverse=True)[:k]
+
+        found = list(workout_planner.kbest_circuits(exercises, answers, scoring, k=k, max_per_equipment=caps, max_minutes=max_minutes, minutes=minutes))
+        assert [score for score, _ in found] == expected
+        assert len(set(tuple(id(ex) for ex in circuit) for _, circuit in found)) == len(found)
+        if not caps and max_minutes is None:
+            assert found[0][1] == workout_planner.optimalcircuitwithcounts(exercises, answers, scoring)
+
+
+# every day has the muscle groups its split gives it, each muscle group gets its sessions, and no exercise is done two days in a row
+def check_week(week, expected_groups):
+    assert [sorted(ex.muscle_group for ex in day) for day in week] == [sorted(groups) for groups in expected_groups]
+    for yesterday, today in zip(week, week[1:]):
+        assert not {(ex.muscle_group, ex.name) for ex in yesterday} & {(ex.muscle_group, ex.name) for ex in today}
+
+
+def test_plan_week_rules():
+    core = workout_planner.planner_core()
+    answers = workout_planner.normalize_answers(planner_bench.synthetic_profiles(1)[0])
+    groups = workout_planner.getgroups(core.catalog)
+
+    answers["full_body_split"] = "Full-Body"
+    check_week(workout_planner.plan_week(core.catalog, answers, core.scoring, days=3, workers=1), [groups] * 3)
+
+    answers["full_body_split"] = "Split"
+    week = workout_planner.plan_week(core.catalog, answers, core.scoring, days=4, workers=1)
+    assert sorted(ex.muscle_group for day in week for ex in day) == sorted(groups * 2)
+    check_week(week, [[ex.muscle_group for ex in day] for day in week])
+
+    splits = [groups[:3], groups[3:], groups]
+    check_week(workout_planner.plan_week(core.catalog, answers, core.scoring, days=3, splits=splits, workers=1), splits)
+
+
+# one candidate runs in this process, it still stops at the time budget and fills in the rest of the week
+def test_plan_week_time_budget():
+    core = workout_planner.planner_core()
+    answers = workout_planner.normalize_answers(planner_bench.synthetic_profiles(1)[0])
+    answers["full_body_split"] = "Full-Body"
+    start = time.perf_counter()
+    week = workout_planner.plan_week(core.catalog, answers, core.scoring, days=7, time_budget=0.2)
+    assert time.perf_counter() - start < 1.0
+    check_week(week, [workout_planner.getgroups(core.catalog)] * 7)
+
+
+def catalog_contents(catalog):
+    return [(ex.name, ex.muscle_group, ex.equipment_type) for ex in catalog]
+
+
+def write_export(path, rows):
+    path.write_text("name,muscle_group,equipment_type\n" + "".join(f"{name},{group},{equipment}\n" for name, group, equipment in rows))
+
+
+# the first row for every (name, muscle group) wins, the same name for another muscle group is its own exercise
+def test_load_catalog_dedupes_name_and_group():
+    catalog = workout_planner.load_catalog([
+        ("Dips", "chest", "bodyweight"), ("Dips", "triceps", "bodyweight"), ("Dips", "chest", "machine"), ("Fly", "chest", "cable"),
+    ])
+    assert catalog_contents(catalog) == [("Dips", "chest", "bodyweight"), ("Dips", "triceps", "bodyweight"), ("Fly", "chest", "cable")]
+
+
+# a snapshot loads back the same catalog, indexes included
+def test_catalog_snapshot_round_trip(tmp_path):
+    catalog = planner_bench.catalog_from_rows(planner_bench.synthetic_rows(500, 7, 5, seed=2))
+    path = str(tmp_path / "catalog.snapshot")
+    workout_planner.save_catalog_snapshot(catalog, path, (123, 456))
+    loaded, stamp = workout_planner.load_catalog_snapshot(path)
+    assert stamp == (123, 456)
+    assert catalog_contents(loaded) == catalog_contents(catalog)
+    assert loaded.groups() == catalog.groups()
+    assert loaded.circuit_candidates() == catalog.circuit_candidates()
+    for group in catalog.groups():
+        assert list(loaded.rows_for_group(group)) == list(catalog.rows_for_group(group))
+    for equipment in catalog.equipment_types:
+        assert list(loaded.rows_for_equipment(equipment)) == list(catalog.rows_for_equipment(equipment))
+
+
+# a changed export, a cut short or broken snapshot and a folder that cant be written to all still load the export
+def test_load_exercise_file_falls_back_to_the_export(tmp_path):
+    export = tmp_path / "exercises.csv"
+    snapshot = tmp_path / "exercises.csv.snapshot"
+    rows = [("Curl", "biceps", "dumbbell"), ("Pushdown", "triceps", "cable")]
+    write_export(export, rows)
+    assert catalog_contents(workout_planner.load_exercise_file(str(export))) == rows
+    assert workout_planner.load_catalog_snapshot(str(snapshot))[1] == workout_planner.file_stamp(str(export))
+
+    # stale: the export changed after the snapshot was made
+    rows.append(("Squat", "legs", "bodyweight"))
+    write_export(export, rows)
+    assert catalog_contents(workout_planner.load_exercise_file(str(export))) == rows
+    assert workout_planner.load_catalog_snapshot(str(snapshot))[1] == workout_planner.file_stamp(str(export))
+
+    # cut short, then garbage, then empty
+    for broken in (snapshot.read_bytes()[:-5], b"not a snapshot at all", b""):
+        snapshot.write_bytes(broken)
+        assert catalog_contents(workout_planner.load_exercise_file(str(export))) == rows
+
+    unwritable = str(tmp_path / "no such folder" / "exercises.snapshot")
+    assert catalog_contents(workout_planner.load_exercise_file(str(export), unwritable)) == rows
+
+
+def plan_contents(plan):
+    return None if plan is None else (plan[0], [ex.name for ex in plan[1]])
+
+
+# puts one plan per answer code given on the command line into the PlanCache file, run as its own process
+cache_writer = """
+import sys
+import workout_planner
+cache = workout_planner.PlanCache(sys.argv[1])
+workout_planner.recommend_many([workout_planner.decode_answers(int(code)) for code in sys.argv[2:]], cache=cache)
+cache.close()
+"""
+
+def run_cache_writers(path, code_lists):
+    import os
+    import subprocess
+    import sys
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    writers = [subprocess.Popen([sys.executable, "-c", cache_writer, path] + [str(code) for code in codes], cwd=here) for codes in code_lists]
+    assert [writer.wait(timeout=120) for writer in writers] == [0] * len(writers)
+
+
+# plans saved by one process are read back by another (a restart), and several processes can write the same file at once
+def test_plan_cache_across_processes(tmp_path):
+    path = str(tmp_path / "plans.sqlite3")
+    codes = random.Random(5).sample(range(workout_planner.answer_space_size()), 40)
+    expected = [plan_contents(plan) for plan in workout_planner.recommend_many([workout_planner.decode_answers(code) for code in codes])]
+
+    run_cache_writers(path, [codes[:10]])
+    cache = workout_planner.PlanCache(path)
+    assert [plan_contents(cache.get(workout_planner.decode_answers(code))) for code in codes[:10]] == expected[:10]
+    cache.close()
+
+    # four writers at once, overlapping on some answers
+    run_cache_writers(path, [codes[start:start + 15] for start in (0, 8, 16, 25)])
+    cache = workout_planner.PlanCache(path)
+    assert len(cache) == len(codes)
+    assert [plan_contents(cache.get(workout_planner.decode_answers(code))) for code in codes] == expected
+    assert cache.misses == 0
+    cache.close()
+
+
+# a different catalog or different scoring never reads the plans saved for the old one
+def test_plan_cache_fingerprint(tmp_path):
+    path = str(tmp_path / "plans.sqlite3")
+    rows = planner_bench.synthetic_rows(60, 5, 4, seed=8)
+    catalog = planner_bench.catalog_from_rows(rows)
+    scoring = workout_planner.planner_core().scoring
+    answers = planner_bench.synthetic_profiles(1, seed=8)[0]
+    plan = workout_planner.recommend_many([answers], catalog, scoring)[0]
+    cache = workout_planner.PlanCache(path, catalog, scoring)
+    cache.put(answers, plan)
+    assert plan_contents(workout_planner.PlanCache(path, catalog, scoring).get(answers)) == plan_contents(plan)
+
+    renamed = planner_bench.catalog_from_rows([("Other " + rows[0][0],) + tuple(rows[0][1:])] + rows[1:])
+    assert workout_planner.PlanCache(path, renamed, scoring).get(answers) is None
+    assert workout_planner.PlanCache(path, planner_bench.catalog_from_rows(rows[:-1]), scoring).get(answers) is None
+
+    rescored = json.loads(json.dumps(scoring))
+    first_table = next(iter(rescored.values()))
+    first_points = next(iter(first_table.values()))
+    first_points[next(iter(first_points))] += 1
+    assert workout_planner.PlanCache(path, catalog, rescored).get(answers) is None
+
+
+# past max_entries the least recently used plan goes (on the put that goes over), and plans older than ttl are planned again
+def test_plan_cache_eviction(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(workout_planner.time, "time", lambda: next(clock))
+    catalog = planner_bench.catalog_from_rows(planner_bench.synthetic_rows(60, 5, 4, seed=9))
+    scoring = workout_planner.planner_core().scoring
+    profiles = [workout_planner.decode_answers(code) for code in random.Random(9).sample(range(workout_planner.answer_space_size()), 30)]
+    plans = workout_planner.recommend_many(profiles, catalog, scoring)
+
+    cache = workout_planner.PlanCache(str(tmp_path / "lru.sqlite3"), catalog, scoring, max_entries=5)
+    for spot, (answers, plan) in enumerate(zip(profiles, plans)):
+        cache.put(answers, plan)
+        assert len(cache) == min(spot + 1, 5)
+
+        # the first plan keeps getting used so it never goes
+        assert plan_contents(cache.get(profiles[0])) == plan_contents(plans[0])
+    assert [cache.get(answers) is not None for answers in profiles] == [True] + [False] * 25 + [True] * 4
+
+    cache = workout_planner.PlanCache(str(tmp_path / "ttl.sqlite3"), catalog, scoring, ttl=10)
+    cache.put(profiles[0], plans[0])
+    assert cache.get(profiles[0]) is not None
+    for _ in range(10):
+        next(clock)
+    assert cache.get(profiles[0]) is None
+    cache.evict()
+    assert len(cache) == 0
@@ -1,7 +1,16 @@
 from functools import lru_cache
 from copy import deepcopy
+from array import array
+import mmap
+import os
+import struct
+import sys
+import time
 
 class BaseExercise:
+    # no per exercise __dict__, big catalogs have a lot of these
+    __slots__ = ("name", "muscle_group", "equipment_type")
+
     # constructor
     def __init__(self, name, muscle_group, equipment_type):
         # name of exercise, muscle group it hits, and equipment type
@@ -9,6 +18,359 @@ class BaseExercise:
         self.muscle_group = muscle_group
         self.equipment_type = equipment_type
 
+# a whole catalog of exercises stored as columns of small ints instead of one object per exercise
+# every name, muscle group and equipment type string is only stored once and rows just hold its code,
+# and the muscle group / equipment indexes are kept up to date as exercises are added so nothing has to regroup them later
+class ExerciseCatalog:
+    __slots__ = (
+        "names", "muscle_groups", "equipment_types",
+        "name_codes", "group_codes", "equipment_codes",
+        "name_lookup", "group_lookup", "equipment_lookup",
+        "group_rows", "equipment_rows", "sorted_groups", "candidates",
+    )
+
+    # constructor, can start from any list of exercises
+    def __init__(self, exercises=()):
+
+        # each different string once, its spot in the list is its code
+        self.names = []
+        self.muscle_groups = []
+        self.equipment_types = []
+        self.name_lookup = {}
+        self.group_lookup = {}
+        self.equipment_lookup = {}
+
+        # one code per exercise (row)
+        self.name_codes = array("I")
+        self.group_codes = array("H")
+        self.equipment_codes = array("H")
+
+        # rows for every muscle group and equipment type code
+        self.group_rows = []
+        self.equipment_rows = []
+
+        # worked out when first needed, thrown away whenever something is added
+        self.sorted_groups = None
+        self.candidates = None
+
+        for ex in exercises:
+            self.add(ex.name, ex.muscle_group, ex.equipment_type)
+        self.compact()
+
+    # the name lookup is a dict entry per different name, which is most of the memory for a big catalog,
+    # so its dropped once the catalog is built and only made again if more exercises get added
+    def compact(self):
+        self.name_lookup = None
+
+    # gives back the code for a string, adding it to the table if its new
+    @staticmethod
+    def intern(table, lookup, value):
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(table)
+            table.append(value)
+        return code
+
+    # adds one exercise and updates the indexes, gives back its row
+    def add(self, name, muscle_group, equipment_type):
+        row = len(self.name_codes)
+        if self.name_lookup is None:
+            self.name_lookup = {name: code for code, name in enumerate(self.names)}
+        group_code = self.intern(self.muscle_groups, self.group_lookup, muscle_group)
+        equipment_code = self.intern(self.equipment_types, self.equipment_lookup, equipment_type)
+        self.name_codes.append(self.intern(self.names, self.name_lookup, name))
+        self.group_codes.append(group_code)
+        self.equipment_codes.append(equipment_code)
+
+        if group_code == len(self.group_rows):
+            self.group_rows.append(array("I"))
+        self.group_rows[group_code].append(row)
+        if equipment_code == len(self.equipment_rows):
+            self.equipment_rows.append(array("I"))
+        self.equipment_rows[equipment_code].append(row)
+
+        self.sorted_groups = None
+        self.candidates = None
+        return row
+
+    def __len__(self):
+        return len(self.name_codes)
+
+    # catalog[row] gives a view that works anywhere a BaseExercise does
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("exercise row out of range")
+        return ExerciseView(self, row)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield ExerciseView(self, row)
+
+    # sorted muscle groups, same as getgroups gives for a list
+    def groups(self):
+        if self.sorted_groups is None:
+            self.sorted_groups = sorted(self.muscle_groups)
+        return self.sorted_groups
+
+    # rows that hit a muscle group, in the order they were added
+    def rows_for_group(self, muscle_group):
+        code = self.group_lookup.get(muscle_group)
+        return self.group_rows[code] if code is not None else array("I")
+
+    # rows that use an equipment type, in the order they were added
+    def rows_for_equipment(self, equipment_type):
+        code = self.equipment_lookup.get(equipment_type)
+        return self.equipment_rows[code] if code is not None else array("I")
+
+    # first row of every equipment type in each muscle group (the only ones the dp ever needs to look at)
+    def circuit_candidates(self):
+        if self.candidates is None:
+            self.candidates = {}
+            for muscle in self.groups():
+                per_equipment = {}
+                for row in self.rows_for_group(muscle):
+                    equipment = self.equipment_types[self.equipment_codes[row]]
+                    if equipment not in per_equipment:
+                        per_equipment[equipment] = row
+                self.candidates[muscle] = per_equipment
+        return self.candidates
+
+    # one score per row, only looks each equipment type up once
+    def score_array(self, equipment_points):
+        points = [equipment_points.get(equipment, 0) for equipment in self.equipment_types]
+        return [points[code] for code in self.equipment_codes]
+
+# a list of strings kept as one utf-8 blob and where each one starts, a string only gets made when its asked for
+# catalog snapshots load their names like this so a million names is one copy instead of a million objects
+class PackedStrings:
+    __slots__ = ("blob", "starts", "extra")
+
+    # constructor
+    def __init__(self, blob, starts):
+        self.blob = blob
+        self.starts = starts
+
+        # strings appended after loading just go in a plain list
+        self.extra = []
+
+    def __len__(self):
+        return len(self.starts) - 1 + len(self.extra)
+
+    def __getitem__(self, index):
+        packed = len(self.starts) - 1
+        if index < 0:
+            index += len(self)
+        if index >= packed:
+            return self.extra[index - packed]
+        return str(self.blob[self.starts[index]:self.starts[index + 1]], "utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, value):
+        self.extra.append(value)
+
+# one row of an ExerciseCatalog that looks like a BaseExercise (name, muscle_group, equipment_type) without copying anything
+class ExerciseView:
+    __slots__ = ("catalog", "row")
+
+    # constructor
+    def __init__(self, catalog, row):
+        self.catalog = catalog
+        self.row = row
+
+    @property
+    def name(self):
+        return self.catalog.names[self.catalog.name_codes[self.row]]
+
+    @property
+    def muscle_group(self):
+        return self.catalog.muscle_groups[self.catalog.group_codes[self.row]]
+
+    @property
+    def equipment_type(self):
+        return self.catalog.equipment_types[self.catalog.equipment_codes[self.row]]
+
+    # two views are the same exercise if they point at the same row of the same catalog
+    def __eq__(self, other):
+        return isinstance(other, ExerciseView) and other.catalog is self.catalog and other.row == self.row
+
+    def __hash__(self):
+        return hash((id(self.catalog), self.row))
+
+    def __repr__(self):
+        return f"ExerciseView({self.name!r}, {self.muscle_group!r}, {self.equipment_type!r})"
+
+# reads (name, muscle_group, equipment_type) rows one at a time from a .csv export (with those column names) or a .jsonl one (one object per line)
+# nothing but the current line is ever held, so the file can be way bigger than memory
+def read_exercise_rows(path):
+    # imported here since csv and json pull in re, which is most of the cost of importing this file
+    import csv
+    import json
+
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.endswith(".csv"):
+            records = csv.DictReader(file)
+        else:
+            records = (json.loads(line) for line in file if line.strip())
+        for record in records:
+            yield record["name"], record["muscle_group"], record["equipment_type"]
+
+# builds an ExerciseCatalog straight from rows as they are read, the first row for every (name, muscle group) wins
+# like the dps id_or_name, so the same exercise for the same muscle group is only ever in the catalog once
+def load_catalog(rows):
+    catalog = ExerciseCatalog()
+    catalog.name_lookup = {}
+
+    # (name code, group code) packed into one int per row thats been kept, ints are way smaller than tuples of strings
+    seen = set()
+    for name, muscle_group, equipment_type in rows:
+        name_code = catalog.name_lookup.get(name)
+        group_code = catalog.group_lookup.get(muscle_group)
+        if name_code is not None and group_code is not None and (name_code << 16 | group_code) in seen:
+            continue
+        row = catalog.add(name, muscle_group, equipment_type)
+        seen.add(catalog.name_codes[row] << 16 | catalog.group_codes[row])
+    catalog.compact()
+    return catalog
+
+# snapshot layout: header, then the names as one utf-8 blob with where each name starts, the muscle group and equipment strings
+# (small, so each is one blob split by \0), then the three code columns, then the rows of every muscle group and equipment type back to back with where each one starts
+catalog_snapshot_header = struct.Struct("<4sHQQIIQIIII")
+catalog_snapshot_version = 1
+
+# size and modified time of a file, saved in a snapshot so it can tell when the export it came from changed
+def file_stamp(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+# saves a catalog as one binary file that load_catalog_snapshot can map back in without parsing anything row by row
+def save_catalog_snapshot(catalog, path, source_stamp=(0, 0)):
+    def packed(values, typecode):
+        column = array(typecode, values)
+        if sys.byteorder == "big":
+            column.byteswap()
+        return column.tobytes()
+
+    def rows_and_starts(row_lists):
+        starts = [0]
+        for rows in row_lists:
+            starts.append(starts[-1] + len(rows))
+        return packed((row for rows in row_lists for row in rows), "I") + packed(starts, "I")
+
+    names = bytearray()
+    name_starts = [0]
+    for name in catalog.names:
+        names += name.encode("utf-8")
+        name_starts.append(len(names))
+    groups = "\0".join(catalog.muscle_groups).encode("utf-8")
+    equipment = "\0".join(catalog.equipment_types).encode("utf-8")
+    header = catalog_snapshot_header.pack(
+        b"WPCS", catalog_snapshot_version, source_stamp[0], source_stamp[1], len(catalog),
+        len(catalog.names), len(names), len(groups), len(equipment), len(catalog.muscle_groups), len(catalog.equipment_types),
+    )
+
+    # writes to a temp file first so nobody ever reads half a snapshot
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(header)
+        file.write(names)
+        file.write(packed(name_starts, "Q"))
+        file.write(groups)
+        file.write(equipment)
+        file.write(packed(catalog.name_codes, "I"))
+        file.write(packed(catalog.group_codes, "H"))
+        file.write(packed(catalog.equipment_codes, "H"))
+        file.write(rows_and_starts(catalog.group_rows))
+        file.write(rows_and_starts(catalog.equipment_rows))
+    os.replace(temp_path, path)
+
+# maps a snapshot in and copies each column out in one go, gives back (catalog, source stamp)
+def load_catalog_snapshot(path):
+    with open(path, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(data)
+    try:
+        magic, version, source_size, source_mtime, rows, name_count, names_length, groups_length, equipment_length, group_count, equipment_count = catalog_snapshot_header.unpack_from(data, 0)
+        if magic != b"WPCS" or version != catalog_snapshot_version:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        offset = catalog_snapshot_header.size
+
+        def blob(length):
+            nonlocal offset
+            if offset + length > len(data):
+                raise ValueError(f"{path} is cut short")
+            copied = bytes(view[offset:offset + length])
+            offset += length
+            return copied
+
+        def strings(length, count):
+            return str(blob(length), "utf-8").split("\0") if count else []
+
+        def column(typecode, count):
+            nonlocal offset
+            values = array(typecode)
+            end = offset + count * values.itemsize
+            if end > len(data):
+                raise ValueError(f"{path} is cut short")
+            values.frombytes(view[offset:end])
+            if sys.byteorder == "big":
+                values.byteswap()
+            offset = end
+            return values
+
+        def row_lists(count):
+            all_rows = column("I", rows)
+            starts = column("I", count + 1)
+            return [all_rows[starts[code]:starts[code + 1]] for code in range(count)]
+
+        catalog = ExerciseCatalog()
+        catalog.names = PackedStrings(blob(names_length), column("Q", name_count + 1))
+        catalog.muscle_groups = strings(groups_length, group_count)
+        catalog.equipment_types = strings(equipment_length, equipment_count)
+        if len(catalog.muscle_groups) != group_count or len(catalog.equipment_types) != equipment_count:
+            raise ValueError(f"{path} has the wrong number of muscle groups or equipment types")
+        catalog.name_codes = column("I", rows)
+        catalog.group_codes = column("H", rows)
+        catalog.equipment_codes = column("H", rows)
+        catalog.group_rows = row_lists(group_count)
+        catalog.equipment_rows = row_lists(equipment_count)
+        if offset != len(data):
+            raise ValueError(f"{path} is the wrong size")
+    finally:
+        view.release()
+        data.close()
+
+    # the muscle group and equipment lookups are tiny, the name one is left out like after compact()
+    catalog.group_lookup = {group: code for code, group in enumerate(catalog.muscle_groups)}
+    catalog.equipment_lookup = {equipment: code for code, equipment in enumerate(catalog.equipment_types)}
+    catalog.compact()
+    return catalog, (source_size, source_mtime)
+
+# loads an exercise export, from its snapshot when theres one made from the same file and by streaming the export (and saving a snapshot) otherwise
+def load_exercise_file(path, snapshot_path=None):
+    if snapshot_path is None:
+        snapshot_path = path + ".snapshot"
+    stamp = file_stamp(path)
+    if os.path.exists(snapshot_path):
+        try:
+            catalog, snapshot_stamp = load_catalog_snapshot(snapshot_path)
+            if snapshot_stamp == stamp:
+                return catalog
+        except (OSError, ValueError, struct.error, UnicodeDecodeError):
+            pass
+    catalog = load_catalog(read_exercise_rows(path))
+
+    # a snapshot only makes the next load faster, so a folder that cant be written to just means going without one
+    try:
+        save_catalog_snapshot(catalog, snapshot_path, stamp)
+    except OSError:
+        pass
+    return catalog
+
 # used to validate waht the user says, and if it doesnt match options given, will ask to input within what is asked
 def get_valid_input(questions, answer):
     
@@ -29,11 +391,84 @@ def get_valid_input(questions, answer):
         else:
             print(f"Invalid input. Please choose from: {', '.join(answer)}")
 
-# gets alternative exercise for the muscle groups if an exercise is taken or you just wanna change it
-def get_second_best(exercises, useranswers, scoring, target_muscle, current_name):
+# set to a PlannerMetrics to see where a plan spends its time, when its None (the default) the hot paths only check that and move on
+planner_metrics = None
+
+# counts and times what a plan does while its active (with PlannerMetrics() as metrics: ...): the score stage (equipment_scores and
+# exercise_score_array), optimalcircuitwithcounts and its CircuitAssignment (PlannerSession too), every CountsTable (kbest_circuits) and
+# RankedAlternatives.next_alternative, plus the old optimalcircuitwithdp, scoring_every_exercise and get_second_best
+# track_memory also measures the peak memory of every dp memo with tracemalloc, that slows everything down a lot so its off unless asked for
+# callback gets (name, details) every time one of those (other than the per exercise scoring) finishes
+class PlannerMetrics:
+    # constructor
+    def __init__(self, track_memory=False, callback=None):
+        self.track_memory = track_memory
+        self.callback = callback
+
+        # calls and total seconds per function or phase
+        self.calls = {}
+        self.seconds = {}
+
+        # how many different dp states got worked out at every depth (muscle group index), added up over every dp call
+        self.depth_states = {}
+
+        # the biggest memo any one dp call built, in entries and in peak bytes while it ran
+        self.memo_entries = 0
+        self.memo_peak_bytes = 0
+
+        # how many counts states every CountsTable level had, added up over every table, and the most states any one table held
+        self.table_states = {}
+        self.table_entries = 0
+
+        # exercises next_alternative had to skip because they were already used
+        self.alternatives_skipped = 0
+
+        self.previous = None
+        self.started_tracing = False
+
+    def __enter__(self):
+        global planner_metrics
+        self.previous = planner_metrics
+        planner_metrics = self
+        if self.track_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+        return self
+
+    def __exit__(self, *error):
+        global planner_metrics
+        planner_metrics = self.previous
+        if self.started_tracing:
+            import tracemalloc
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    # one more call of name that took seconds
+    def record(self, name, seconds, calls=1):
+        self.calls[name] = self.calls.get(name, 0) + calls
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    # everything measured so far as plain dicts, ready for json
+    def report(self):
+        return {
+            "calls": dict(self.calls),
+            "seconds": {name: round(seconds, 6) for name, seconds in self.seconds.items()},
+            "depth_states": dict(sorted(self.depth_states.items())),
+            "memo_entries": self.memo_entries,
+            "memo_peak_bytes": self.memo_peak_bytes if self.track_memory else None,
+            "table_states": dict(sorted(self.table_states.items())),
+            "table_entries": self.table_entries,
+            "alternatives_skipped": self.alternatives_skipped,
+        }
 
-    # contains exercises that are in the muscle group of said target muscle group
-    potentialexercises = [ex for ex in exercises if ex.muscle_group == target_muscle and ex.name != current_name]
+# gets alternative exercise for the muscle groups if an exercise is taken or you just wanna change it
+# if scores from exercise_score_array are passed in it reads those instead of scoring every exercise again
+def get_second_best(exercises, useranswers, scoring, target_muscle, current_name, scores=None):
+    metrics = planner_metrics
+    if metrics is not None:
+        start = time.perf_counter()
 
     # gets best score from the second best exercise
     best_score = float('-inf')
@@ -41,21 +476,123 @@ def get_second_best(exercises, useranswers, scoring, target_muscle, current_name
     # second best
     second_best = None
 
+    # a catalog already knows which rows hit the target, a plain list has to be checked one by one
+    if isinstance(exercises, ExerciseCatalog):
+        positions = exercises.rows_for_group(target_muscle)
+    else:
+        positions = range(len(exercises))
+
     # loops through every exercise that is in the same muscle group as target
-    for ex in potentialexercises:
+    for position in positions:
+        ex = exercises[position]
+        if ex.muscle_group != target_muscle or ex.name == current_name:
+            continue
 
         # gets score
-        score = scoring_every_exercise(ex, useranswers, scoring)
+        if scores is not None:
+            score = scores[position]
+        else:
+            score = scoring_every_exercise(ex, useranswers, scoring)
 
         # goes through and finds the second best score to return 
         if score > best_score:
             best_score = score
             second_best = ex
+
+    if metrics is not None:
+        seconds = time.perf_counter() - start
+        metrics.record("get_second_best", seconds)
+        if metrics.callback is not None:
+            metrics.callback("get_second_best", {"seconds": seconds, "muscle_group": target_muscle})
     return second_best
 
 
+# every muscle group's exercises sorted best score first for one set of answers, so asking for the 2nd, 3rd, ... nth best
+# alternative is just moving a cursor instead of scanning and rescoring the whole list every time
+# ties keep list order so the first alternative is the same one get_second_best gives, and anything already used in
+# the circuit (or already swapped out) is skipped so replacing twice doesnt bounce back to the first exercise
+class RankedAlternatives:
+    # constructor, scores are the per exercise scores from exercise_score_array
+    def __init__(self, exercises, scores):
+        self.exercises = exercises
+        self.scores = scores
+
+        # muscle group -> positions best first, only sorted the first time that muscle group is asked about
+        self.ranked = {}
+
+        # muscle group -> how far down the ranking has already been handed out or skipped
+        self.cursor = {}
+
+        # muscle group -> names already used for it
+        self.used = {}
+
+        # a plain list has no index, so it gets grouped once here (a catalog already has one)
+        if isinstance(exercises, ExerciseCatalog):
+            self.group_positions = None
+        else:
+            self.group_positions = {}
+            for position, ex in enumerate(exercises):
+                self.group_positions.setdefault(ex.muscle_group, []).append(position)
+
+    # positions for a muscle group, best score first
+    def ranking(self, muscle_group):
+        ranked = self.ranked.get(muscle_group)
+        if ranked is None:
+            if self.group_positions is None:
+                positions = self.exercises.rows_for_group(muscle_group)
+            else:
+                positions = self.group_positions.get(muscle_group, [])
+
+            # sorted is stable so equal scores stay in list order
+            ranked = self.ranked[muscle_group] = sorted(positions, key=lambda position: -self.scores[position])
+        return ranked
+
+    # top k exercises for a muscle group no matter whats been used
+    def top(self, muscle_group, k):
+        return [self.exercises[position] for position in self.ranking(muscle_group)[:k]]
+
+    # marks an exercise as used so its never handed out as an alternative
+    def mark_used(self, exercise):
+        self.used.setdefault(exercise.muscle_group, set()).add(exercise.name)
+
+    # next best exercise for the muscle group that hasnt been used yet, or None if there are none left
+    def next_alternative(self, muscle_group):
+        metrics = planner_metrics
+        if metrics is not None:
+            start = time.perf_counter()
+
+        ranked = self.ranking(muscle_group)
+        used = self.used.setdefault(muscle_group, set())
+        first = cursor = self.cursor.get(muscle_group, 0)
+
+        # used names only ever grow, so anything the cursor already passed never has to be looked at again
+        alternative = None
+        while cursor < len(ranked):
+            ex = self.exercises[ranked[cursor]]
+            cursor += 1
+            if ex.name not in used:
+                used.add(ex.name)
+                alternative = ex
+                break
+        self.cursor[muscle_group] = cursor
+
+        # the first call for a muscle group includes sorting it
+        if metrics is not None:
+            seconds = time.perf_counter() - start
+            skipped = cursor - first - (alternative is not None)
+            metrics.record("RankedAlternatives.next_alternative", seconds)
+            metrics.alternatives_skipped += skipped
+            if metrics.callback is not None:
+                metrics.callback("RankedAlternatives.next_alternative", {"seconds": seconds, "muscle_group": muscle_group, "skipped": skipped})
+        return alternative
+
+
 # scores every exercise depending on the user answers for the questions given
 def scoring_every_exercise(exercise, useranswers, scoring):
+    metrics = planner_metrics
+    if metrics is not None:
+        start = time.perf_counter()
+
     # total starts at 0 since nothing has been answered yet
     total = 0
 
@@ -64,14 +601,143 @@ def scoring_every_exercise(exercise, useranswers, scoring):
         exercise_scores = scoring.get(question,{})
         answer_scores = exercise_scores.get(answer, {})
         total += answer_scores.get(exercise.equipment_type, 0)
+
+    if metrics is not None:
+        metrics.record("scoring_every_exercise", time.perf_counter() - start)
     return total
 
+# adds up the points each equipment type gets from the answers, scores only depend on equipment type so this only has to run once per set of answers
+def equipment_scores(useranswers, scoring):
+    metrics = planner_metrics
+    if metrics is not None:
+        start = time.perf_counter()
+
+    totals = {}
+    for question, answer in useranswers.items():
+        for equipment, score in scoring.get(question, {}).get(answer, {}).items():
+            totals[equipment] = totals.get(equipment, 0) + score
+
+    if metrics is not None:
+        seconds = time.perf_counter() - start
+        metrics.record("equipment_scores", seconds)
+        if metrics.callback is not None:
+            metrics.callback("equipment_scores", {"seconds": seconds})
+    return totals
+
+# gives the score of every exercise in the same order as exercises, same numbers as scoring_every_exercise
+def exercise_score_array(exercises, equipment_points):
+    metrics = planner_metrics
+    if metrics is not None:
+        start = time.perf_counter()
+
+    if isinstance(exercises, ExerciseCatalog):
+        scores = exercises.score_array(equipment_points)
+    else:
+        scores = [equipment_points.get(ex.equipment_type, 0) for ex in exercises]
+
+    if metrics is not None:
+        seconds = time.perf_counter() - start
+        metrics.record("exercise_score_array", seconds)
+        if metrics.callback is not None:
+            metrics.callback("exercise_score_array", {"seconds": seconds, "exercises": len(scores)})
+    return scores
+
+# numpy is only needed for the vectorized scoring, so its imported when that gets used instead of being required
+def load_numpy():
+    try:
+        import numpy
+    except ImportError as error:
+        raise ImportError("vectorized scoring needs numpy (pip install numpy)") from error
+    return numpy
+
+# the scoring tables packed into one questions x answers x equipment array of scores
+# every question gets one extra answer spot at the end that scores 0 for anything the table doesnt have (same as scoring.get(...) falling back to {})
+class ScoringTensor:
+    # constructor
+    def __init__(self, scoring_tables, equipment_types):
+        np = load_numpy()
+        self.questions = list(scoring_tables)
+        self.answer_codes = [{answer: code for code, answer in enumerate(scoring_tables[question])} for question in self.questions]
+        self.unknown = max((len(codes) for codes in self.answer_codes), default=0)
+
+        # whole numbers stay whole numbers, and use the smallest int that can hold the biggest possible total
+        values = [score for table in scoring_tables.values() for answer_scores in table.values() for score in answer_scores.values()]
+        if all(isinstance(score, int) for score in values):
+            biggest = sum(max((abs(score) for answer_scores in table.values() for score in answer_scores.values()), default=0) for table in scoring_tables.values())
+            dtype = np.int16 if biggest < 2 ** 15 else np.int32 if biggest < 2 ** 31 else np.int64
+        else:
+            dtype = np.float64
+
+        self.tensor = np.zeros((len(self.questions), self.unknown + 1, len(equipment_types)), dtype=dtype)
+        for question_code, question in enumerate(self.questions):
+            for answer, answer_scores in scoring_tables[question].items():
+                for equipment_code, equipment in enumerate(equipment_types):
+                    self.tensor[question_code, self.answer_codes[question_code][answer], equipment_code] = answer_scores.get(equipment, 0)
+
+    # turns profiles into a profiles x questions array of answer spots (exact match like the scalar scoring, anything else is the 0 spot)
+    def encode_profiles(self, profiles):
+        np = load_numpy()
+        rows = [
+            [codes.get(profile.get(question), self.unknown) for question, codes in zip(self.questions, self.answer_codes)]
+            for profile in profiles
+        ]
+        return np.array(rows, dtype=np.intp).reshape(len(rows), len(self.questions))
+
+    # profiles x equipment scores, added up one question at a time in the same order the scalar scoring does
+    def equipment_matrix(self, encoded):
+        np = load_numpy()
+        totals = np.zeros((encoded.shape[0], self.tensor.shape[2]), dtype=self.tensor.dtype)
+        for question_code in range(len(self.questions)):
+            totals += self.tensor[question_code, encoded[:, question_code]]
+        return totals
+
+# scores every exercise for every profile in one go, gives a profiles x exercises numpy array
+# entry [p, x] is exactly scoring_every_exercise(exercises[x], profiles[p], scoring_tables)
+def vectorized_score_matrix(profiles, exercises, scoring_tables=None):
+    np = load_numpy()
+    if scoring_tables is None:
+        scoring_tables = planner_core().scoring
+
+    # equipment code of every exercise (a catalog already has them)
+    if isinstance(exercises, ExerciseCatalog):
+        equipment_types = exercises.equipment_types
+        equipment_codes = np.frombuffer(exercises.equipment_codes, dtype=np.uint16)
+    else:
+        lookup = {}
+        equipment_codes = np.array([lookup.setdefault(ex.equipment_type, len(lookup)) for ex in exercises], dtype=np.intp)
+        equipment_types = list(lookup)
+
+    tensor = ScoringTensor(scoring_tables, equipment_types)
+    return tensor.equipment_matrix(tensor.encode_profiles(profiles))[:, equipment_codes]
+
 # gets all muscle groups from exercises
 def getgroups(exercises):
+    if isinstance(exercises, ExerciseCatalog):
+        return exercises.groups()
     return sorted(set(ex.muscle_group for ex in exercises))
 
+# for every muscle group, the position of the first exercise of each equipment type
+# exercises with the same equipment in the same muscle group always score the same, so only the first one of each can ever win a tie
+def circuit_candidates(exercises):
+    if isinstance(exercises, ExerciseCatalog):
+        return exercises.circuit_candidates()
+    muscle_groups_to_candidates = {}
+    for position, ex in enumerate(exercises):
+        per_equipment = muscle_groups_to_candidates.setdefault(ex.muscle_group, {})
+        if ex.equipment_type not in per_equipment:
+            per_equipment[ex.equipment_type] = position
+    return muscle_groups_to_candidates
+
 # finds the best circuit with different equipment types not just one with dp
-def optimalcircuitwithdp(exercises, useranswers, scoring):
+# pass a dict as stats to get the memo's hits, misses and entries back (planner_bench.py uses it)
+def optimalcircuitwithdp(exercises, useranswers, scoring, stats=None):
+    metrics = planner_metrics
+    if metrics is not None:
+        start = time.perf_counter()
+        if metrics.track_memory:
+            import tracemalloc
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
 
     # gets all muscle groups needed
     muscle_groups = getgroups(exercises)
@@ -80,6 +746,10 @@ def optimalcircuitwithdp(exercises, useranswers, scoring):
     muscle_groups_to_exercises = {}
     for ex in exercises:
         muscle_groups_to_exercises.setdefault(ex.muscle_group, []).append(ex)
+
+    if metrics is not None:
+        grouped = time.perf_counter()
+        metrics.record("optimalcircuitwithdp.grouping", grouped - start)
     
     # memoization
     @lru_cache(maxsize=None)
@@ -87,6 +757,10 @@ def optimalcircuitwithdp(exercises, useranswers, scoring):
     # will return best score and best circuit based off of input
     def dp(index, used_exercises, used_equipment):
 
+        # only runs on a memo miss, so this counts the different states at every depth (the last depth is the finished circuits)
+        if metrics is not None:
+            metrics.depth_states[index] = metrics.depth_states.get(index, 0) + 1
+
         # if all muscle groups have been used, return no score and empty circuit for now
         if index == len(muscle_groups):
             return 0, []
@@ -135,67 +809,1220 @@ def optimalcircuitwithdp(exercises, useranswers, scoring):
 
     # return best circuit
     _, best_circuit = dp(0, (), ())
+
+    # how much the memo actually helped
+    if stats is not None:
+        info = dp.cache_info()
+        stats.update(hits=info.hits, misses=info.misses, entries=info.currsize)
+
+    # the memo is still alive here (it goes away with dp when this returns), so this is the most it ever held
+    # recursion time includes the scoring_every_exercise calls, their own share is under that name
+    if metrics is not None:
+        finished = time.perf_counter()
+        metrics.record("optimalcircuitwithdp.recursion", finished - grouped)
+        metrics.record("optimalcircuitwithdp", finished - start)
+        details = {"seconds": finished - start, "memo_entries": dp.cache_info().currsize}
+        metrics.memo_entries = max(metrics.memo_entries, details["memo_entries"])
+        if metrics.track_memory:
+            details["memo_peak_bytes"] = tracemalloc.get_traced_memory()[1] - memory_before
+            metrics.memo_peak_bytes = max(metrics.memo_peak_bytes, details["memo_peak_bytes"])
+        if metrics.callback is not None:
+            metrics.callback("optimalcircuitwithdp", details)
     return best_circuit
 
 
-# these are some base exercises that I could think of, basically a base circuit anyone can do with the name of the exercise, the muscle group that it targets, and the type of equipment that is used
-base_exercises = [
-    BaseExercise("Bench Press", "chest", "barbell"),
-    BaseExercise("Bicep Curl", "biceps", "dumbbell"),
-    BaseExercise("Tricep Pushdowns", "triceps", "machine"),
-    BaseExercise("Overhead Press", "shoulders", "dumbbell"),
-    BaseExercise("Squats", "legs", "barbell"),
-    BaseExercise("Deadlifts", "legs", "barbell"),
-    BaseExercise("Barbell Rows", "back", "barbell"),
-]
+# finds the same circuit as optimalcircuitwithdp but only looks at how many times each equipment type has been used
+# the penalty only looks at those counts, and every muscle group is only visited once so the used exercises tuple never actually blocks anything
+def optimalcircuitwithcounts(exercises, useranswers, scoring, scores=None):
+    metrics = planner_metrics
+    if metrics is not None:
+        start = time.perf_counter()
 
-# if asked for a machine only workout, these are some exercises that I could think of that are machine only, showing name, muscle group it targets, and machine only equipment
-machine_only_exercises = [
-    BaseExercise("Chest Press Machine", "chest", "machine"),
-    BaseExercise("Seated Bicep Curls", "biceps", "machine"),
-    BaseExercise("Tricep Pushdown", "triceps", "machine"),
-    BaseExercise("Seated Machine Shoulder Presses", "shoulders", "machine"),
-    BaseExercise("Leg Press Machine", "legs", "machine"), 
-    BaseExercise("Machine Rows", "back", "machine"), 
-] 
- 
- 
- 
- 
-# if asked for a dumbbel only workout, do usual, only dumbbell equipment and hits every muscle group needed (planning to try and implement more things for leg since its so much)
-dumbbell_only_exercises = [ 
-    BaseExercise("Dumbbell Bench Press", "chest", "dumbbell"), 
-    BaseExercise("Bicep Curls", "biceps", "dumbbell"), 
-    BaseExercise("Dumbbell Skull Crushers", "triceps", "dumbbell"), 
-    BaseExercise("Lateral Raises", "shoulders", "dumbbell"), 
-    BaseExercise("Squats", "legs", "dumbbell"), 
-    BaseExercise("Deadlifts", "legs", "dumbbell"),
-    BaseExercise("Bent Over Dumbbell Rows", "back", "dumbbell"),
-]
+    # scores every exercise once if they werent already worked out
+    if scores is None:
+        scores = exercise_score_array(exercises, equipment_scores(useranswers, scoring))
 
+    # gets all muscle groups needed
+    muscle_groups = getgroups(exercises)
 
-# Cable only exercises, hits all muscle groups (free to change want more input)
-cable_only_exercises = [
-    BaseExercise("Cable Chest Press", "chest", "cable"),
-    BaseExercise("Cable Bicep Curls", "biceps", "cable"),
-    BaseExercise("Cable Tricep Pushdowns", "triceps", "cable"),
-    BaseExercise("Cable Shoulder Press", "shoulders", "cable"),
-    BaseExercise("Cable Squats", "legs", "cable"),
-    BaseExercise("Cable RDL", "legs", "cable"),
-    BaseExercise("Seated Cable Rows", "back", "cable"),
-]
+    # exercises with the same equipment in the same muscle group also lead to the same next state,
+    # so only the first one of each equipment type can ever win (keeps list order so ties break the same way as the old solver)
+    muscle_groups_to_candidates = circuit_candidates(exercises)
 
+    # gives every equipment type its own spot in the counts
+    equipment_types = sorted(set(equipment for muscle in muscle_groups for equipment in muscle_groups_to_candidates[muscle]))
+    equipment_slot = {equipment: slot for slot, equipment in enumerate(equipment_types)}
 
+    # reads every candidate's score once instead of at every state
+    options = []
+    for muscle in muscle_groups:
+        options.append([
+            (exercises[position], equipment_slot[equipment], scores[position])
+            for equipment, position in muscle_groups_to_candidates[muscle].items()
+        ])
+
+    if metrics is not None:
+        gathered = time.perf_counter()
+        metrics.record("optimalcircuitwithcounts.options", gathered - start)
+
+    # assigns muscle groups to equipment types (no table, so lots of equipment types stay fast) with the dps tie break
+    circuit = [ex for ex, _, _ in CircuitAssignment(options, len(equipment_types)).best_path()]
+
+    # total includes the scoring when it wasnt passed in, that has its own names too
+    if metrics is not None:
+        seconds = time.perf_counter() - start
+        metrics.record("optimalcircuitwithcounts", seconds)
+        if metrics.callback is not None:
+            metrics.callback("optimalcircuitwithcounts", {"seconds": seconds, "muscle_groups": len(options), "equipment_types": len(equipment_types)})
+    return circuit
+
+
+# dp table: best score from each muscle group on for every equipment counts state
+# options[index] is a list of (exercise, equipment slot, score) for each muscle group, in the order ties should be broken
+# kbest_circuits needs a score for every state for its bounds, but there are up to C(groups + types - 1, types - 1) states at the last
+# muscle group, so it gets slow past a handful of equipment types (2000 exercises in 24 groups: 1.9 s with 6 types, 63 s with 8)
+# optimalcircuitwithcounts and PlannerSession use CircuitAssignment instead, python planner_bench.py circuit-scaling compares the two
+# caps (a max count for every equipment slot, or None) leaves out every state that goes over one, and a state that cant be finished
+# without going over scores -inf
+# with a deadline (a time.monotonic() time) it raises TimeoutError if building it is still going at that time
+class CountsTable:
+    # constructor
+    def __init__(self, options, equipment_count, caps=None, deadline=None):
+        metrics = planner_metrics
+        if metrics is not None:
+            start = time.perf_counter()
+
+        self.options = options
+        self.deadline = deadline
+
+        # packs the counts into one int (one digit per equipment type) so states are cheap to hash
+        self.base = len(options) + 1
+        self.place = [self.base ** slot for slot in range(equipment_count)]
+
+        # every counts state you can actually be in before each muscle group
+        self.states = [{0}]
+        for index in range(len(options)):
+            self.check_deadline()
+            if caps is None:
+                self.states.append({state + self.place[slot] for state in self.states[-1] for _, slot, _ in options[index]})
+            else:
+                self.states.append({state + self.place[slot] for state in self.states[-1] for _, slot, _ in options[index] if self.used(state, slot) < caps[slot]})
+
+        # how big the table is going to be (the last level is the finished circuits)
+        if metrics is not None:
+            entries = 0
+            for index, states in enumerate(self.states):
+                metrics.table_states[index] = metrics.table_states.get(index, 0) + len(states)
+                entries += len(states)
+            metrics.table_entries = max(metrics.table_entries, entries)
+            metrics.record("CountsTable.states", time.perf_counter() - start)
+
+        # once everything is picked there is nothing left to score
+        self.bestscores = [None] * len(options) + [dict.fromkeys(self.states[-1], 0)]
+        self.bestchoices = [None] * len(options)
+        self.refill(len(options) - 1)
+
+        if metrics is not None:
+            seconds = time.perf_counter() - start
+            metrics.record("CountsTable", seconds)
+            if metrics.callback is not None:
+                metrics.callback("CountsTable", {"seconds": seconds, "muscle_groups": len(options), "equipment_types": equipment_count, "states": entries})
+
+    # how many times the equipment in slot has been used in a counts state
+    def used(self, state, slot):
+        return state // self.place[slot] % self.base
+
+    def check_deadline(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise TimeoutError("ran out of time building the counts table")
+
+    # fills the table from a muscle group back to the first one (everything after it has to be filled already)
+    def refill(self, last_index):
+        metrics = planner_metrics
+        if metrics is not None:
+            start = time.perf_counter()
+
+        base = self.base
+        place = self.place
+        for index in range(last_index, -1, -1):
+            self.check_deadline()
+            nextscores = self.bestscores[index + 1]
+            scores_here = {}
+            choices_here = {}
+            for state in self.states[index]:
+
+                bestscore = float('-inf')
+                bestchoice = None
+
+                # goes through the candidates for the muscle group your at, a state thats not in the next level went over a cap
+                for choice, (ex, slot, score) in enumerate(self.options[index]):
+                    nextscore = nextscores.get(state + place[slot])
+                    if nextscore is None:
+                        continue
+
+                    # same diversity penalty as before, just read from the counts
+                    total = score - (state // place[slot] % base) * 2 + nextscore
+
+                    # if total is better than old best score than just update best score and best choice
+                    if total > bestscore:
+                        bestscore = total
+                        bestchoice = choice
+
+                scores_here[state] = bestscore
+                choices_here[state] = bestchoice
+            self.bestscores[index] = scores_here
+            self.bestchoices[index] = choices_here
+
+        # the scoring part of building the table, without working out the states
+        if metrics is not None:
+            metrics.record("CountsTable.refill", time.perf_counter() - start)
+
+    # the best options in order, starting from a muscle group and counts state
+    def best_path(self, index=0, state=0):
+        path = []
+        for index in range(index, len(self.options)):
+            option = self.options[index][self.bestchoices[index][state]]
+            path.append(option)
+            state += self.place[option[1]]
+        return path
+
+
+# finds the same circuit as CountsTable without a table, so it stays fast no matter how many equipment types there are
+# the total is every pick's score minus c * (c - 1) for every equipment type used c times, and that penalty only grows faster the more a type is used,
+# so its a min cost assignment of muscle groups to equipment types: groups are added one at a time, each along the cheapest chain of
+# "this group moves to that equipment instead" swaps (a shortest path over the equipment types), which keeps the assignment optimal after every group
+# then the same tie break as the dp (first option in list order that can still be part of a best circuit) is rebuilt one muscle group at a time
+# options and best_path are the same as CountsTable's
+class CircuitAssignment:
+    # constructor
+    def __init__(self, options, equipment_count):
+        self.options = options
+        self.equipment_count = equipment_count
+
+        # which option every muscle group is on, and how many times every equipment type is used
+        self.choice = [None] * len(options)
+        self.counts = [0] * equipment_count
+
+        metrics = planner_metrics
+        if metrics is not None:
+            start = time.perf_counter()
+
+        for index in range(len(options)):
+            self.add_group(index)
+
+        if metrics is not None:
+            added = time.perf_counter()
+            metrics.record("CircuitAssignment.add_groups", added - start)
+
+        for index in range(len(options)):
+            self.break_tie(index)
+
+        if metrics is not None:
+            finished = time.perf_counter()
+            metrics.record("CircuitAssignment.tie_break", finished - added)
+            metrics.record("CircuitAssignment", finished - start)
+            if metrics.callback is not None:
+                metrics.callback("CircuitAssignment", {"seconds": finished - start, "muscle_groups": len(options), "equipment_types": equipment_count})
+
+    # cheapest swap from every equipment type to every other one: some group thats on the first type moves to its best option of the second type
+    # gives back {(from, to): (cost, group, option)}, frozen groups (and skip) never move
+    def swaps(self, frozen, skip=None):
+        cheapest = {}
+        for index in range(frozen, len(self.options)):
+            current = self.choice[index]
+            if index == skip or current is None:
+                continue
+            _, from_slot, from_score = self.options[index][current]
+            for option, (_, to_slot, to_score) in enumerate(self.options[index]):
+                if to_slot != from_slot:
+                    cost = from_score - to_score
+                    if (from_slot, to_slot) not in cheapest or cost < cheapest[(from_slot, to_slot)][0]:
+                        cheapest[(from_slot, to_slot)] = (cost, index, option)
+        return cheapest
+
+    # cheapest way to end a chain of swaps starting at every equipment type, where stopping at a type costs stop_cost[type]
+    # (bellman ford, theres no negative cycle since the assignment is optimal), gives back (costs, next swap for every type or None to stop there)
+    def chains(self, cheapest, stop_cost):
+        cost = list(stop_cost)
+        step = [None] * self.equipment_count
+        for _ in range(self.equipment_count):
+            changed = False
+            for (from_slot, to_slot), (swap_cost, index, option) in cheapest.items():
+                if swap_cost + cost[to_slot] < cost[from_slot]:
+                    cost[from_slot] = swap_cost + cost[to_slot]
+                    step[from_slot] = (to_slot, index, option)
+                    changed = True
+            if not changed:
+                break
+        return cost, step
+
+    # puts a muscle group on an option and does the chain of swaps from that option's equipment type
+    def apply(self, index, option, step):
+        slot = self.options[index][option][1]
+        self.choice[index] = option
+        self.counts[slot] += 1
+        while step[slot] is not None:
+            to_slot, moved, moved_option = step[slot]
+            self.choice[moved] = moved_option
+            self.counts[slot] -= 1
+            self.counts[to_slot] += 1
+            slot = to_slot
+
+    # adds one muscle group the cheapest way, one more use of a type that is already used c times costs 2c
+    def add_group(self, index):
+        cost, step = self.chains(self.swaps(0), [2 * count for count in self.counts])
+        best = min(range(len(self.options[index])), key=lambda option: cost[self.options[index][option][1]] - self.options[index][option][2])
+        self.apply(index, best, step)
+
+    # cheapest way to reach every equipment type with a chain of swaps, where starting at a type costs start_cost[type]
+    # (the other direction of chains), gives back (costs, swap that got to every type or None if the chain starts there)
+    def reach(self, cheapest, start_cost):
+        cost = list(start_cost)
+        step = [None] * self.equipment_count
+        for _ in range(self.equipment_count):
+            changed = False
+            for (from_slot, to_slot), (swap_cost, index, option) in cheapest.items():
+                if cost[from_slot] + swap_cost < cost[to_slot]:
+                    cost[to_slot] = cost[from_slot] + swap_cost
+                    step[to_slot] = (from_slot, index, option)
+                    changed = True
+            if not changed:
+                break
+        return cost, step
+
+    # takes a muscle group back out, then puts it on the first option in list order that is still part of a best circuit
+    # with every earlier group kept as it is
+    def break_tie(self, index):
+        _, slot, _ = self.options[index][self.choice[index]]
+        self.choice[index] = None
+
+        # what the group leaves open gets filled the cheapest way: groups move over from another type along a chain,
+        # and that type is used once less (saves 2(c - 1)), or nothing moves and its own type is used once less
+        cost, step = self.reach(self.swaps(index + 1), [-2 * (count - 1) for count in self.counts])
+        while step[slot] is not None:
+            from_slot, moved, moved_option = step[slot]
+            self.choice[moved] = moved_option
+            slot = from_slot
+        self.counts[slot] -= 1
+
+        # the best circuits without this group are known now, so the first option that adds the least is the dps pick
+        cost, step = self.chains(self.swaps(index + 1), [2 * count for count in self.counts])
+        added = [cost[option_slot] - score for _, option_slot, score in self.options[index]]
+        self.apply(index, added.index(min(added)), step)
+
+    # the chosen options in order, like CountsTable.best_path() from the start
+    def best_path(self):
+        return [self.options[index][option] for index, option in enumerate(self.choice)]
+
+
+# keeps one user's plan around so changing an answer or pinning / replacing an exercise doesnt start over
+# the muscle groups and candidates never depend on the answers, so an answer change only rescores the equipment types whose points moved
+# and a pin just leaves that muscle group one option, then CircuitAssignment picks the circuit again (a few ms even for big catalogs)
+# answers are checked and spelled like the questionnaire (normalize_answers), so its the same plan as every other way in
+class PlannerSession:
+    # constructor, exercises and scoring default to the planner's catalog and scoring model
+    def __init__(self, useranswers, exercises=None, scoring=None):
+        core = planner_core() if exercises is None or scoring is None else None
+        self.exercises = core.catalog if exercises is None else exercises
+        self.scoring = core.scoring if scoring is None else scoring
+        self.useranswers = normalize_answers(useranswers)
+
+        # points per equipment type and the score of every exercise, kept up to date one answer at a time
+        self.equipment_points = equipment_scores(self.useranswers, self.scoring)
+        self.scores = list(exercise_score_array(self.exercises, self.equipment_points))
+
+        # positions of every exercise by equipment type (a catalog already has this) so a changed score only touches those rows
+        if isinstance(self.exercises, ExerciseCatalog):
+            self.equipment_positions = None
+        else:
+            self.equipment_positions = {}
+            for position, ex in enumerate(self.exercises):
+                self.equipment_positions.setdefault(ex.equipment_type, []).append(position)
+
+        # same muscle groups, candidates and equipment slots as optimalcircuitwithcounts
+        self.muscle_groups = getgroups(self.exercises)
+        self.candidates = circuit_candidates(self.exercises)
+        equipment_types = sorted(set(equipment for muscle in self.muscle_groups for equipment in self.candidates[muscle]))
+        self.equipment_slot = {equipment: slot for slot, equipment in enumerate(equipment_types)}
+
+        # slot index -> position of the exercise the user pinned there
+        self.pins = {}
+
+        self.options = [self.level_options(index) for index in range(len(self.muscle_groups))]
+        self.alternatives = None
+        self.best = None
+
+    # positions that can be picked in a slot: the pinned exercise, or the first exercise of every equipment type
+    def slot_positions(self, index):
+        if index in self.pins:
+            return [self.pins[index]]
+        return self.candidates[self.muscle_groups[index]].values()
+
+    # (exercise, equipment slot, score) for everything that can be picked in a slot
+    def level_options(self, index):
+        return [(self.exercises[position], self.equipment_slot[self.exercises[position].equipment_type], self.scores[position]) for position in self.slot_positions(index)]
+
+    # redoes the options for the given slots, the circuit gets picked again the next time its asked for
+    def resolve(self, indexes):
+        if not indexes:
+            return
+        for index in indexes:
+            self.options[index] = self.level_options(index)
+        self.best = None
+
+    # the current circuit, best first slot to last
+    def circuit(self):
+        if self.best is None:
+            self.best = [ex for ex, _, _ in CircuitAssignment(self.options, len(self.equipment_slot)).best_path()]
+        return self.best
+
+    # changes one answer, only the equipment types whose points moved get their exercises rescored
+    # question and answer are checked like the questionnaire does it (any case), anything it wouldnt take raises ValueError
+    def change_answer(self, question, answer):
+        if question not in answer_lookup:
+            raise ValueError(f"unknown question {question!r}, use one of {', '.join(question_keys)}")
+        spelled = answer_lookup[question].get(str(answer).strip().lower())
+        if spelled is None:
+            raise ValueError(f"{question}: {answer!r} is not one of {', '.join(answer_lookup[question].values())}")
+        answer = spelled
+
+        table = self.scoring.get(question, {})
+        old_points = table.get(self.useranswers.get(question), {})
+        new_points = table.get(answer, {})
+        self.useranswers[question] = answer
+
+        changed = set()
+        for equipment in set(old_points) | set(new_points):
+            difference = new_points.get(equipment, 0) - old_points.get(equipment, 0)
+            if difference:
+                self.equipment_points[equipment] = self.equipment_points.get(equipment, 0) + difference
+                changed.add(equipment)
+        if not changed:
+            return self.circuit()
+
+        for equipment in changed:
+            if self.equipment_positions is None:
+                positions = self.exercises.rows_for_equipment(equipment)
+            else:
+                positions = self.equipment_positions.get(equipment, [])
+            points = self.equipment_points[equipment]
+            for position in positions:
+                self.scores[position] = points
+
+        # rankings were sorted with the old scores
+        self.alternatives = None
+
+        # only slots that can pick one of the changed equipment types read the new scores
+        self.resolve([
+            index for index in range(len(self.muscle_groups))
+            if any(self.exercises[position].equipment_type in changed for position in self.slot_positions(index))
+        ])
+        return self.circuit()
+
+    # keeps the exercise called name in slot index no matter what, the rest of the circuit is picked around it
+    def pin(self, index, name):
+        muscle = self.muscle_groups[index]
+        if isinstance(self.exercises, ExerciseCatalog):
+            positions = self.exercises.rows_for_group(muscle)
+        else:
+            positions = range(len(self.exercises))
+        for position in positions:
+            ex = self.exercises[position]
+            if ex.muscle_group == muscle and ex.name == name:
+                self.pins[index] = position
+                self.resolve([index])
+                return self.circuit()
+        raise ValueError(f"no exercise called {name!r} for {muscle}")
+
+    # lets slot index be picked again
+    def unpin(self, index):
+        if self.pins.pop(index, None) is not None:
+            self.resolve([index])
+        return self.circuit()
+
+    # swaps slot index for the best exercise for that muscle group that hasnt been in it yet, and pins it there
+    # gives back None (and changes nothing) when there are no exercises left to try
+    def replace(self, index):
+        if self.alternatives is None:
+            self.alternatives = RankedAlternatives(self.exercises, self.scores)
+        for ex in self.circuit():
+            self.alternatives.mark_used(ex)
+        alternative = self.alternatives.next_alternative(self.muscle_groups[index])
+        if alternative is None:
+            return None
+        return self.pin(index, alternative.name)
+
+
+# roughly how many minutes one exercise takes with its sets and rest, used when no minutes are given for the duration limit
+minutes_per_exercise = 8
+
+# streams the k best different circuits (one exercise per muscle group), best first, as (score, circuit)
+# score is the same thing the dp maximizes (exercise scores with the -2 per earlier use of the equipment type penalty)
+# max_per_equipment is like {"barbell": 2}, max_minutes caps the whole circuit using minutes (a dict of name -> minutes or a function of the exercise)
+# its a best first search where the bound for an unfinished circuit is its score so far plus the counts dp's best score for the rest
+# the dp already keeps to max_per_equipment (its just a cap on the counts), max_minutes only ever takes options away so the bound never
+# underestimates, so a finished circuit that comes off the heap is better than anything still on it
+# equal bounds go deeper first, so a plateau of circuits with the same score gets finished one by one instead of spread out level by level
+# if time_budget seconds run out it stops searching and fills in the best unfinished circuits greedily so theres still something to give back
+# (the time to build the dp counts too, if that runs out first its just the greedy circuit from the start with no bound to go on)
+def kbest_circuits(exercises, useranswers, scoring, k=5, max_per_equipment=None, max_minutes=None, minutes=None, time_budget=None, scores=None):
+    import heapq
+
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    if scores is None:
+        scores = exercise_score_array(exercises, equipment_scores(useranswers, scoring))
+    if max_per_equipment is None:
+        max_per_equipment = {}
+
+    # how long an exercise takes
+    if minutes is None:
+        minutes_for = lambda ex: minutes_per_exercise
+    elif callable(minutes):
+        minutes_for = minutes
+    else:
+        minutes_for = lambda ex: minutes.get(ex.name, minutes_per_exercise)
+
+    # the counts dp with the equipment caps gives the bound for every unfinished circuit
+    muscle_groups = getgroups(exercises)
+    muscle_groups_to_candidates = circuit_candidates(exercises)
+    equipment_types = sorted(set(equipment for muscle in muscle_groups for equipment in muscle_groups_to_candidates[muscle]))
+    equipment_slot = {equipment: slot for slot, equipment in enumerate(equipment_types)}
+    caps = [min(max_per_equipment.get(equipment, len(muscle_groups)), len(muscle_groups)) for equipment in equipment_types] if max_per_equipment else None
+    try:
+        table = CountsTable([
+            [(exercises[position], equipment_slot[equipment], scores[position]) for equipment, position in muscle_groups_to_candidates[muscle].items()]
+            for muscle in muscle_groups
+        ], len(equipment_types), caps, deadline)
+    except TimeoutError:
+        table = None
+
+    # best score the rest of a circuit can still get from a counts state, without the table all thats left is going greedy
+    def rest_bound(depth, state):
+        return 0 if table is None else table.bestscores[depth][state]
+
+    # counts states are packed the same way as the table does it
+    base = len(muscle_groups) + 1
+    place = [base ** slot for slot in range(len(equipment_types))]
+
+    if isinstance(exercises, ExerciseCatalog):
+        group_positions = {muscle: exercises.rows_for_group(muscle) for muscle in muscle_groups}
+    else:
+        group_positions = {}
+        for position, ex in enumerate(exercises):
+            group_positions.setdefault(ex.muscle_group, []).append(position)
+
+    # exercises with the same equipment (and the same minutes, if minutes matter) are interchangeable, so any circuit using
+    # the (k+1)th one of those is beaten by k circuits that swap it for one of the first k, only the first k ever need looking at
+    options = []
+    for muscle in muscle_groups:
+        buckets = {}
+        choices = []
+        for position in group_positions[muscle]:
+            ex = exercises[position]
+            took = minutes_for(ex) if max_minutes is not None else 0
+            bucket = buckets.setdefault((ex.equipment_type, took), [])
+            if len(bucket) < k and max_per_equipment.get(ex.equipment_type, 1) > 0:
+                bucket.append(position)
+                choices.append((position, equipment_slot[ex.equipment_type], took, scores[position]))
+        options.append(choices)
+
+    # fewest minutes still needed from each muscle group on
+    fewest_minutes_left = [0] * (len(muscle_groups) + 1)
+    for index in range(len(muscle_groups) - 1, -1, -1):
+        fewest_minutes_left[index] = fewest_minutes_left[index + 1] + min((took for _, _, took, _ in options[index]), default=0)
+    if max_minutes is not None and fewest_minutes_left[0] > max_minutes:
+        return
+
+    # what picking an option does to an unfinished circuit (score, minutes, counts state, picked positions), None if it breaks a limit
+    def extend(node, choice):
+        score, took_so_far, state, picked = node
+        position, slot, took, exercise_score = choice
+        used = state // place[slot] % base
+        if used >= max_per_equipment.get(equipment_types[slot], float('inf')):
+            return None
+        if max_minutes is not None and took_so_far + took + fewest_minutes_left[len(picked) + 1] > max_minutes:
+            return None
+        return score + exercise_score - used * 2, took_so_far + took, state + place[slot], picked + (position,)
+
+    # heap entries are (-bound, -depth, picked positions), equal bounds go deeper first and then in list order,
+    # which also makes the first circuit the same one the dp picks
+    heap = [] if table is None else [(-rest_bound(0, 0), 0, (), (0, 0, 0, ()))]
+    found = 0
+    while heap and found < k:
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        _, _, _, node = heapq.heappop(heap)
+        score, _, _, picked = node
+        if len(picked) == len(muscle_groups):
+            found += 1
+            yield score, [exercises[position] for position in picked]
+            continue
+        for choice in options[len(picked)]:
+            child = extend(node, choice)
+            if child is not None:
+
+                # -inf means every way to finish it goes over a cap
+                bound = child[0] + rest_bound(len(child[3]), child[2])
+                if bound > float('-inf'):
+                    heapq.heappush(heap, (-bound, -len(child[3]), child[3], child))
+
+    # ran out of time, finish the most promising unfinished circuits by always taking the best option that still fits
+    if table is None:
+        heap = [(0, 0, (), (0, 0, 0, ()))]
+    if found < k and heap:
+        finished = []
+        for _, _, _, node in heapq.nsmallest(k - found, heap):
+            while node is not None and len(node[3]) < len(muscle_groups):
+                children = [child for child in (extend(node, choice) for choice in options[len(node[3])]) if child is not None]
+                children = [child for child in children if child[0] + rest_bound(len(child[3]), child[2]) > float('-inf')]
+                node = max(children, key=lambda child: child[0] + rest_bound(len(child[3]), child[2])) if children else None
+            if node is not None:
+                finished.append(node)
+        for score, _, _, picked in sorted(finished, key=lambda node: -node[0]):
+            yield score, [exercises[position] for position in picked]
+
+
+# splits the muscle groups over the days of the week, each muscle group gets trained sessions_per_group times on different days
+# spreads them out greedily (emptiest day first, avoiding days right next to another session of the same muscle group),
+# and rng decides ties so every seed gives a different candidate split to try
+def week_split_candidate(muscle_groups, days, sessions_per_group, rng):
+    order = list(muscle_groups)
+    if rng is not None:
+        rng.shuffle(order)
+    day_groups = [[] for _ in range(days)]
+    for muscle in order:
+        taken = []
+        for _ in range(min(sessions_per_group, days)):
+            open_days = [day for day in range(days) if day not in taken]
+            spaced = [day for day in open_days if all(abs(day - other) > 1 for other in taken)] or open_days
+            fewest = min(len(day_groups[day]) for day in spaced)
+            choices = [day for day in spaced if len(day_groups[day]) == fewest]
+            day = choices[0] if rng is None else rng.choice(choices)
+            taken.append(day)
+            day_groups[day].append(muscle)
+    return [sorted(groups) for groups in day_groups]
+
+# best exercises for one fixed split of muscle groups over the days, gives back (score, positions for every day)
+# the diversity penalty is the same -2 for every earlier use of the equipment type, but counted over the whole week, and since
+# that only depends on how many times each equipment type gets used the slots can be filled muscle group by muscle group,
+# which puts each muscle group's sessions right after each other so "not the same exercise as yesterday" only has to remember one exercise
+# if its still going at deadline (a time.monotonic() time) it fills the week in greedily instead
+def best_week_for_split(exercises, scores, day_groups, deadline=None):
+
+    # for every muscle group and equipment type the first two different exercises, the second one is only needed when the first was done the day before
+    muscle_groups_to_options = {}
+    for position, ex in enumerate(exercises):
+        per_equipment = muscle_groups_to_options.setdefault(ex.muscle_group, {}).setdefault(ex.equipment_type, [])
+        if len(per_equipment) < 2 and all(exercises[other].name != ex.name for other in per_equipment):
+            per_equipment.append(position)
+
+    equipment_types = sorted(set(equipment for per_equipment in muscle_groups_to_options.values() for equipment in per_equipment))
+    equipment_slot = {equipment: slot for slot, equipment in enumerate(equipment_types)}
+
+    # every (muscle group, day) that needs an exercise, and whether the slot before it is the same muscle group the day before
+    slots = [(muscle, day) for muscle in getgroups(exercises) for day, groups in enumerate(day_groups) if muscle in groups]
+    follows_yesterday = [index > 0 and slots[index - 1][0] == muscle and slots[index - 1][1] == day - 1 for index, (muscle, day) in enumerate(slots)]
+    options = [
+        [(position, equipment_slot[equipment], scores[position]) for equipment, positions in muscle_groups_to_options[muscle].items() for position in positions]
+        for muscle, _ in slots
+    ]
+
+    # counts packed into one int like optimalcircuitwithcounts
+    base = len(slots) + 1
+    place = [base ** slot for slot in range(len(equipment_types))]
+
+    # the exercise done yesterday for the next slot's muscle group, if it matters
+    def next_yesterday(index, position):
+        return position if index + 1 < len(slots) and follows_yesterday[index + 1] else None
+
+    # filled in order when the table cant be finished in time, always taking the best option for the slot that isnt yesterday's exercise
+    def greedy_week():
+        week = [[] for _ in day_groups]
+        counts = 0
+        yesterday = None
+        total = 0
+        for index, (muscle, day) in enumerate(slots):
+            best = None
+            for position, slot, score in options[index]:
+                if yesterday is not None and exercises[position].name == exercises[yesterday].name:
+                    continue
+                gain = score - (counts // place[slot] % base) * 2
+                if best is None or gain > best[0]:
+                    best = (gain, position, slot)
+            if best is None:
+                return float('-inf'), None
+            gain, position, slot = best
+            total += gain
+            week[day].append(position)
+            counts += place[slot]
+            yesterday = next_yesterday(index, position)
+        return total, week
+
+    # a table level by level like CountsTable instead of a recursive dp, so a long week doesnt run into the recursion limit
+    # every (counts, yesterday) state you can be in before each slot, going forward
+    try:
+        states = [{(0, None)}]
+        for index in range(len(slots)):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError
+            next_states = set()
+            for counts, yesterday in states[-1]:
+                for position, slot, _ in options[index]:
+
+                    # never the same exercise two days in a row
+                    if yesterday is not None and exercises[position].name == exercises[yesterday].name:
+                        continue
+                    next_states.add((counts + place[slot], next_yesterday(index, position)))
+            states.append(next_states)
+
+        # best score from every state on and which option gets it, going backward
+        bestscores = [None] * len(slots) + [dict.fromkeys(states[-1], 0)]
+        bestchoices = [None] * len(slots)
+        for index in range(len(slots) - 1, -1, -1):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError
+            nextscores = bestscores[index + 1]
+            scores_here = {}
+            choices_here = {}
+            for counts, yesterday in states[index]:
+                bestscore = float('-inf')
+                bestchoice = None
+                for choice, (position, slot, score) in enumerate(options[index]):
+                    if yesterday is not None and exercises[position].name == exercises[yesterday].name:
+                        continue
+                    total = score - (counts // place[slot] % base) * 2 + nextscores[(counts + place[slot], next_yesterday(index, position))]
+                    if total > bestscore:
+                        bestscore = total
+                        bestchoice = choice
+                scores_here[(counts, yesterday)] = bestscore
+                choices_here[(counts, yesterday)] = bestchoice
+            bestscores[index] = scores_here
+            bestchoices[index] = choices_here
+    except TimeoutError:
+        return greedy_week()
+
+    # follows the saved choices to fill in every day
+    week = [[] for _ in day_groups]
+    state = (0, None)
+    bestscore = bestscores[0][state]
+    for index, (muscle, day) in enumerate(slots):
+        choice = bestchoices[index][state]
+        if choice is None:
+            return float('-inf'), None
+        position, slot, _ = options[index][choice]
+        week[day].append(position)
+        state = (state[0] + place[slot], next_yesterday(index, position))
+    return bestscore, week
+
+# what each week planner process keeps around, set once when the process starts so the catalog isnt sent with every task
+week_worker_state = {}
+
+def init_week_worker(exercises, scores):
+    week_worker_state["exercises"] = exercises
+    week_worker_state["scores"] = scores
+
+# runs in a worker process, gives back (score, which candidate, positions for every day)
+def solve_week_candidate(candidate, day_groups, deadline):
+    score, week = best_week_for_split(week_worker_state["exercises"], week_worker_state["scores"], day_groups, deadline)
+    return score, candidate, week
+
+# plans a whole week: a list with one circuit per day
+# full body answers train every muscle group every day, split answers spread each muscle group over sessions_per_group days
+# (2 when theres at least 4 days, otherwise 1), or splits can give exactly which muscle groups go on which day
+# equipment diversity is counted over the whole week and an exercise is never done on two days in a row
+# different ways of splitting the muscle groups are tried in a process pool, and whatever is best when time_budget seconds run out is returned
+# (a split still being worked out at that point is filled in greedily), full body answers and splits only have one candidate so nothing runs in parallel
+def plan_week(exercises, useranswers, scoring, days=3, splits=None, sessions_per_group=None, time_budget=5.0, workers=None, max_candidates=32, scores=None):
+    import concurrent.futures
+    import random
+
+    deadline = time.monotonic() + time_budget
+    if scores is None:
+        scores = exercise_score_array(exercises, equipment_scores(useranswers, scoring))
+    muscle_groups = getgroups(exercises)
+
+    # which splits of muscle groups over the days to try
+    if splits is not None:
+        candidates = [[sorted(groups) for groups in splits]]
+    elif str(useranswers.get("full_body_split", "")).lower() != "split":
+        candidates = [[list(muscle_groups) for _ in range(days)]]
+    else:
+        if sessions_per_group is None:
+            sessions_per_group = 2 if days >= 4 else 1
+        candidates = []
+        for seed in range(max_candidates):
+            candidate = week_split_candidate(muscle_groups, days, sessions_per_group, random.Random(seed) if seed else None)
+            if candidate not in candidates:
+                candidates.append(candidate)
+
+    # best so far, ties go to the earlier candidate so the answer doesnt depend on which process finishes first
+    best = (float('-inf'), -1, None)
+
+    def keep_best(result):
+        nonlocal best
+        score, candidate, week = result
+        if week is not None and (score, -candidate) > (best[0], -best[1]):
+            best = result
+
+    # one candidate (or one worker) isnt worth starting processes for
+    if len(candidates) == 1 or workers == 1:
+        for candidate, day_groups in enumerate(candidates):
+            if candidate > 0 and time.monotonic() >= deadline:
+                break
+            score, week = best_week_for_split(exercises, scores, day_groups, deadline)
+            keep_best((score, candidate, week))
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_week_worker, initargs=(exercises, scores))
+        try:
+            pending = {executor.submit(solve_week_candidate, candidate, day_groups, deadline) for candidate, day_groups in enumerate(candidates)}
+            while pending:
+
+                # always waits for at least one answer, after that stops at the deadline
+                timeout = None if best[2] is None else max(0.0, deadline - time.monotonic())
+                done, pending = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    keep_best(future.result())
+                if not done and best[2] is not None:
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    _, _, week = best
+    if week is None:
+        return []
+    return [[exercises[position] for position in day] for day in week]
+
+# picks the equipment type with the most points, ties go to whichever comes first in typesofequipment like the questionnaire always did
+def best_equipment_for(equipment_points):
+    total_points = {equipment: equipment_points.get(equipment, 0) for equipment in typesofequipment}
+    return max(total_points, key=total_points.get)
+
+# matches answers to how the questionnaire spells them no matter the case, and complains about anything thats not an option
+def normalize_answers(useranswers):
+    normalized = {}
+    for question in question_keys:
+        answer = str(useranswers.get(question, "")).strip().lower()
+        if answer not in answer_lookup[question]:
+            raise ValueError(f"{question}: {answer!r} is not one of {', '.join(answer_lookup[question].values())}")
+        normalized[question] = answer_lookup[question][answer]
+    return normalized
+
+# reads profiles one at a time from a .jsonl file (one useranswers dict per line) or a .csv file with a column per question
+def load_profiles(path):
+    # imported here since csv and json pull in re, which is most of the cost of importing this file
+    import csv
+    import json
+
+    with open(path, newline="") as file:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+# turns a (best equipment, circuit) plan into plain dicts and lists so it can be saved as json
+def plan_to_dict(plan):
+    best_equipment, circuit = plan
+    return {
+        "best_equipment": best_equipment,
+        "circuit": [{"name": ex.name, "muscle_group": ex.muscle_group, "equipment_type": ex.equipment_type} for ex in circuit],
+    }
+
+# plans a whole bunch of profiles at once, gives back (best equipment, circuit) for each one in the same order
+# there are only a few thousand different answer combos so each one only gets worked out once, and answers that end up
+# with the same equipment scores share a plan too (circuits are tuples since the same one gets handed out a lot)
+def recommend_many(profiles, exercises=None, scoring_tables=None, cache=None):
+    if exercises is None:
+        exercises = planner_core().catalog
+    if scoring_tables is None:
+        scoring_tables = planner_core().scoring
+
+    plans = []
+    plans_by_answers = {}
+    plans_by_points = {}
+    for profile in profiles:
+
+        # exact same answers as before, just reuse the plan
+        answers_key = tuple(profile.get(question) for question in question_keys)
+        plan = plans_by_answers.get(answers_key)
+        if plan is None:
+            answers = normalize_answers(profile)
+            equipment_points = equipment_scores(answers, scoring_tables)
+            points_key = tuple(sorted(equipment_points.items()))
+            plan = plans_by_points.get(points_key)
+
+            # a plan cache (PlanCache made for the same exercises and scoring) might have it from an earlier run
+            if plan is None and cache is not None:
+                plan = cache.get(answers)
+                if plan is not None:
+                    plans_by_points[points_key] = plan
+
+            # new scores, so this is where the dp actually runs
+            if plan is None:
+                exercise_scores = exercise_score_array(exercises, equipment_points)
+                circuit = optimalcircuitwithcounts(exercises, answers, scoring_tables, exercise_scores)
+                plan = plans_by_points[points_key] = (best_equipment_for(equipment_points), tuple(circuit))
+                if cache is not None:
+                    cache.put(answers, plan)
+            plans_by_answers[answers_key] = plan
+        plans.append(plan)
+    return plans
+
+
+# what bulk plan workers read: the exercises, the scoring tables and the plans each worker already worked out
+# set in the parent right before the pool forks so workers get it for free (spawned workers get it once through init_bulk_worker)
+# it stays set until the pool is gone, so a worker the pool forks again later still finds it
+bulk_worker_state = {}
+
+def init_bulk_worker(exercises, scoring_tables):
+    bulk_worker_state.clear()
+    bulk_worker_state["exercises"] = exercises
+    bulk_worker_state["scoring"] = scoring_tables
+    bulk_worker_state["codes_by_answers"] = {}
+    bulk_worker_state["plans_by_points"] = {}
+    bulk_worker_state["plans_by_code"] = {}
+    bulk_worker_state["sent"] = set()
+
+    # a catalog view knows its row, a plain list needs the spot of every exercise looked up
+    if isinstance(exercises, ExerciseCatalog):
+        bulk_worker_state["spot"] = None
+    else:
+        bulk_worker_state["spot"] = {id(ex): spot for spot, ex in enumerate(exercises)}
+
+# runs in a worker on one shard of raw profiles: normalizes and numbers every profile and plans the ones it hasnt seen
+# gives back (the encode_answers number of every profile, {number: (best equipment index, exercise positions)}) where the plans
+# are only the ones this worker hasnt sent back before, so only small ints go back and forth instead of exercises
+def plan_profiles(profiles):
+    exercises = bulk_worker_state["exercises"]
+    scoring_tables = bulk_worker_state["scoring"]
+    codes_by_answers = bulk_worker_state["codes_by_answers"]
+    plans_by_points = bulk_worker_state["plans_by_points"]
+    plans_by_code = bulk_worker_state["plans_by_code"]
+    sent = bulk_worker_state["sent"]
+
+    codes = []
+    new_plans = {}
+    for profile in profiles:
+
+        # exact same answers as before dont need to be checked again
+        answers_key = tuple(profile.get(question) for question in question_keys)
+        code = codes_by_answers.get(answers_key)
+        if code is None:
+            code = codes_by_answers[answers_key] = encode_answers(normalize_answers(profile))
+        codes.append(code)
+        if code in sent:
+            continue
+
+        plan = plans_by_code.get(code)
+        if plan is None:
+            answers = decode_answers(code)
+            equipment_points = equipment_scores(answers, scoring_tables)
+
+            # different answers can still give the same points
+            points_key = tuple(sorted(equipment_points.items()))
+            plan = plans_by_points.get(points_key)
+            if plan is None:
+                spot = bulk_worker_state["spot"]
+                circuit = optimalcircuitwithcounts(exercises, answers, scoring_tables, exercise_score_array(exercises, equipment_points))
+                plan = plans_by_points[points_key] = (
+                    typesofequipment.index(best_equipment_for(equipment_points)),
+                    tuple(ex.row if spot is None else spot[id(ex)] for ex in circuit),
+                )
+            plans_by_code[code] = plan
+        new_plans[code] = plan
+        sent.add(code)
+    return codes, new_plans
+
+# same plans as recommend_many, worked out in a pool of worker processes and streamed back in the same order as profiles
+# profiles go to the workers as they are in shards of chunksize, the workers normalize, number and plan them, so all this process does is
+# slice the input and hand back plans (every different plan is only turned back into exercises once)
+# workers are forked so they share the exercises and scoring with this process
+def recommend_many_parallel(profiles, exercises=None, scoring_tables=None, workers=None, chunksize=1024):
+    import itertools
+    import multiprocessing
+
+    if exercises is None:
+        exercises = planner_core().catalog
+    if scoring_tables is None:
+        scoring_tables = planner_core().scoring
+
+    # shards of raw profiles, made as the pool's task thread hands out work
+    def shards():
+        iterator = iter(profiles)
+        while True:
+            shard = list(itertools.islice(iterator, chunksize))
+            if not shard:
+                return
+            yield shard
+
+    # a worker only leaves out a plan it already sent with an earlier shard, and shards are handed out and given back in order,
+    # so that plan is always already here
+    # lots of answers (and every worker) come back with the same plan, so each one is only turned into exercises once
+    def stream(results):
+        plans = {}
+        built = {}
+        for codes, new_plans in results:
+            for code, plan in new_plans.items():
+                exercise_plan = built.get(plan)
+                if exercise_plan is None:
+                    best, positions = plan
+                    exercise_plan = built[plan] = (typesofequipment[best], tuple(exercises[position] for position in positions))
+                plans[code] = exercise_plan
+            for code in codes:
+                yield plans[code]
+
+    if workers == 1:
+        init_bulk_worker(exercises, scoring_tables)
+        try:
+            yield from stream(plan_profiles(shard) for shard in shards())
+        finally:
+            bulk_worker_state.clear()
+        return
+
+    # fork shares everything with the workers as is, without it every worker gets one pickled copy when it starts
+    if "fork" in multiprocessing.get_all_start_methods():
+        init_bulk_worker(exercises, scoring_tables)
+        pool = multiprocessing.get_context("fork").Pool(workers)
+    else:
+        pool = multiprocessing.get_context("spawn").Pool(workers, initializer=init_bulk_worker, initargs=(exercises, scoring_tables))
+
+    # imap gives the shards back in the order they went out
+    try:
+        yield from stream(pool.imap(plan_profiles, shards()))
+    finally:
+        pool.terminate()
+        bulk_worker_state.clear()
+
+# turns a full set of answers into one number (each question is a digit, its answer's spot in the options list is the value)
+# every combination of answers gets its own number from 0 up to answer_space_size() - 1
+def encode_answers(useranswers):
+    answers = normalize_answers(useranswers)
+    code = 0
+    for question, _, options in questionnaire:
+        code = code * len(options) + options.index(answers[question])
+    return code
+
+# goes back from a number to the answers it stands for
+def decode_answers(code):
+    useranswers = {}
+    for question, _, options in reversed(questionnaire):
+        code, spot = divmod(code, len(options))
+        useranswers[question] = options[spot]
+    return {question: useranswers[question] for question in question_keys}
+
+# how many different ways the questionnaire can be answered
+def answer_space_size():
+    size = 1
+    for _, _, options in questionnaire:
+        size *= len(options)
+    return size
+
+# hash of everything a plan depends on, if the scoring tables, the exercises or the questions change so does this
+def planner_fingerprint(exercises=None, scoring_tables=None):
+    import hashlib
+    import json
+
+    if exercises is None:
+        exercises = planner_core().catalog
+    if scoring_tables is None:
+        scoring_tables = planner_core().scoring
+    contents = json.dumps({
+        "questions": [[question, options] for question, _, options in questionnaire],
+        "scoring": scoring_tables,
+        "exercises": [[ex.name, ex.muscle_group, ex.equipment_type] for ex in exercises],
+        "equipment": typesofequipment,
+    }, sort_keys=True)
+    return hashlib.sha256(contents.encode()).digest()
+
+# where the precomputed table lives by default, right next to this file
+answer_table_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_table.bin")
+
+# header is a magic word, the fingerprint, how many answer combos, how long each circuit is, and how big each exercise number is
+answer_table_header = struct.Struct("<4s32sIIB")
+
+# works out every possible set of answers ahead of time and saves the plans to a small binary file
+# each plan is one byte for the best equipment (its spot in typesofequipment) then one number per circuit slot (its spot in exercises)
+def build_answer_table(path=None, exercises=None, scoring_tables=None):
+    if path is None:
+        path = answer_table_path
+    if exercises is None:
+        exercises = planner_core().catalog
+    if scoring_tables is None:
+        scoring_tables = planner_core().scoring
+
+    # same exercise can show up in a lot of plans so look its spot up once (catalog views already know their row)
+    if isinstance(exercises, ExerciseCatalog):
+        exercise_spot = None
+    else:
+        exercise_spot = {id(ex): spot for spot, ex in enumerate(exercises)}
+    typecode = "H" if len(exercises) <= 0xFFFF else "I"
+    circuit_length = len(getgroups(exercises))
+
+    size = answer_space_size()
+    best = array("B")
+    circuits = array(typecode)
+    for best_equipment, circuit in recommend_many((decode_answers(code) for code in range(size)), exercises, scoring_tables):
+        best.append(typesofequipment.index(best_equipment))
+        circuits.extend(ex.row if exercise_spot is None else exercise_spot[id(ex)] for ex in circuit)
+
+    # puts each plan's bytes right after each other so plan number n always starts at the same spot
+    records = bytearray()
+    slot_size = circuits.itemsize * circuit_length
+    circuit_bytes = circuits.tobytes()
+    for code in range(size):
+        records.append(best[code])
+        records += circuit_bytes[code * slot_size:(code + 1) * slot_size]
+
+    # writes to a temp file first so nobody ever reads half a table
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(answer_table_header.pack(b"WPAT", planner_fingerprint(exercises, scoring_tables), size, circuit_length, ord(typecode)))
+        file.write(records)
+    os.replace(temp_path, path)
+
+# reads plans straight out of the table file (memory mapped) so a recommendation is just a jump to the right spot
+class AnswerTable:
+    def __init__(self, path, exercises):
+        self.exercises = exercises
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.fingerprint, self.size, circuit_length, typecode = answer_table_header.unpack_from(self.data, 0)
+        if magic != b"WPAT":
+            raise ValueError(f"{path} is not an answer table")
+        self.record = struct.Struct(f"<B{circuit_length}{chr(typecode)}")
+        if len(self.data) != answer_table_header.size + self.size * self.record.size:
+            raise ValueError(f"{path} is the wrong size")
+
+    # gives back (best equipment, circuit) for a set of answers
+    def lookup(self, useranswers):
+        best, *circuit = self.record.unpack_from(self.data, answer_table_header.size + encode_answers(useranswers) * self.record.size)
+        return typesofequipment[best], tuple(self.exercises[spot] for spot in circuit)
+
+    def close(self):
+        self.data.close()
+
+# opens the precomputed table, building it first if its missing or was made with different scoring tables or exercises
+def load_answer_table(path=None, exercises=None, scoring_tables=None):
+    if path is None:
+        path = answer_table_path
+    if exercises is None:
+        exercises = planner_core().catalog
+    fingerprint = planner_fingerprint(exercises, scoring_tables)
+    if os.path.exists(path):
+        try:
+            table = AnswerTable(path, exercises)
+            if table.fingerprint == fingerprint:
+                return table
+            table.close()
+        except (ValueError, struct.error):
+            pass
+    build_answer_table(path, exercises, scoring_tables)
+    return AnswerTable(path, exercises)
+
+
+# where the plan cache lives by default, right next to this file
+plan_cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plan_cache.sqlite3")
+
+# plans saved in a sqlite file so the same answers are never planned twice, across processes and restarts
+# rows are keyed by planner_fingerprint (so a different catalog or scoring never reads old plans) and the encode_answers number
+# least recently used plans go first on the put that would go over max_entries, and plans older than ttl seconds are planned again (ttl=None keeps them)
+class PlanCache:
+    # constructor
+    def __init__(self, path=None, exercises=None, scoring_tables=None, max_entries=100000, ttl=None, timeout=30.0):
+        self.path = plan_cache_path if path is None else path
+        self.exercises = planner_core().catalog if exercises is None else exercises
+        self.scoring = planner_core().scoring if scoring_tables is None else scoring_tables
+        self.fingerprint = planner_fingerprint(self.exercises, self.scoring)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+        # where every exercise in a plain list is, made the first time a plan gets saved
+        self.spot = None
+
+        # a sqlite connection cant be used after a fork, so each process opens its own
+        self.connection = None
+        self.connection_pid = None
+
+        # counting the rows on every put would be a scan per plan, so evict remembers how many more fit and put counts that down
+        # (only this process's puts are counted, so with several writers the file can go over until one of them evicts)
+        self.room = None
+
+    def connect(self):
+        if self.connection is None or self.connection_pid != os.getpid():
+            import sqlite3
+
+            # autocommit, and wal so readers in other processes dont wait on a writer (busy timeout for writers waiting on each other)
+            self.connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self.connection_pid = os.getpid()
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                "fingerprint BLOB NOT NULL, code INTEGER NOT NULL, best INTEGER NOT NULL, circuit BLOB NOT NULL,"
+                "created REAL NOT NULL, used REAL NOT NULL, PRIMARY KEY (fingerprint, code))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS plans_used ON plans (used)")
+        return self.connection
+
+    # gives back the saved (best equipment, circuit) for a set of answers, or None
+    def get(self, useranswers):
+        connection = self.connect()
+        code = encode_answers(normalize_answers(useranswers))
+        row = connection.execute("SELECT best, circuit, created FROM plans WHERE fingerprint = ? AND code = ?", (self.fingerprint, code)).fetchone()
+        now = time.time()
+        if row is None or (self.ttl is not None and row[2] < now - self.ttl):
+            self.misses += 1
+            return None
+        self.hits += 1
+        connection.execute("UPDATE plans SET used = ? WHERE fingerprint = ? AND code = ?", (now, self.fingerprint, code))
+
+        # positions are saved as the raw bytes of an array of ints
+        positions = array("I")
+        positions.frombytes(row[1])
+        return typesofequipment[row[0]], tuple(self.exercises[position] for position in positions)
+
+    # saves the (best equipment, circuit) plan for a set of answers
+    def put(self, useranswers, plan):
+        best_equipment, circuit = plan
+        if isinstance(self.exercises, ExerciseCatalog):
+            positions = array("I", (ex.row for ex in circuit))
+        else:
+            if self.spot is None:
+                self.spot = {id(ex): position for position, ex in enumerate(self.exercises)}
+            positions = array("I", (self.spot[id(ex)] for ex in circuit))
+        now = time.time()
+        self.connect().execute(
+            "INSERT OR REPLACE INTO plans (fingerprint, code, best, circuit, created, used) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.fingerprint, encode_answers(normalize_answers(useranswers)), typesofequipment.index(best_equipment), positions.tobytes(), now, now),
+        )
+        # a replaced plan doesnt add a row, so this can evict a little early but never late
+        if self.room is not None:
+            self.room -= 1
+        if self.room is None or self.room < 0:
+            self.evict()
+
+    # drops plans past the ttl, then the least recently used ones until there are max_entries left
+    def evict(self):
+        connection = self.connect()
+        if self.ttl is not None:
+            connection.execute("DELETE FROM plans WHERE created < ?", (time.time() - self.ttl,))
+        extra = connection.execute("SELECT COUNT(*) FROM plans").fetchone()[0] - self.max_entries
+        if extra > 0:
+            connection.execute("DELETE FROM plans WHERE rowid IN (SELECT rowid FROM plans ORDER BY used LIMIT ?)", (extra,))
+        self.room = max(0, -extra)
+
+    def __len__(self):
+        return self.connect().execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    def close(self):
+        if self.connection is not None and self.connection_pid == os.getpid():
+            self.connection.close()
+        self.connection = None
 
-# bodyweight only, hits all parts (lowkey could not think of other exercises might edit later if given more input)
-bodyweight_only_exercises = [
-    BaseExercise("Pushups", "chest", "bodyweight"),
-    BaseExercise("Chin ups", "biceps", "bodyweight"),
-    BaseExercise("Bench Dips", "triceps", "bodyweight"),
-    BaseExercise("Pike Pushups", "shoulders", "bodyweight"),
-    BaseExercise("Lunges", "legs", "bodyweight"),
-    BaseExercise("Pullups", "back", "bodyweight"),
-]
 
 # tallying up points for each workout type depending on the way the user answers
 # FOR NOW THESE ARE MY OPINIONS CAUSE LOWKEY YOU CANNOT PROVE THIS IS BETTER THAN THAT SO I AM GOING OFF THE INFO I HAVE AND WHAT I THINK IS BEST FOR EACH CATEGORY
@@ -274,201 +2101,519 @@ scoring_for_versatile_vs_convenience = {
     "convenient": {"bodyweight": 4, "machine": 3, "dumbbell": 2, "cable": 1},
 }
 
+# every table above by its useranswers key, only used when theres no scoring_model.json
+# the file is where the weights get tuned (and versioned), so these can fall behind it
+default_scoring_tables = {
+    "priority": scoring_for_priority,
+    "experience": scoring_for_experience,
+    "injury_prone": scoring_for_injury_prone,
+    "goal": scoring_for_goal,
+    "limited_weight": scoring_for_limited_weight,
+    "home_gym": scoring_for_home_gym,
+    "full_body_split": scoring_for_full_body_split,
+    "sport": scoring_for_sport,
+    "versatile_vs_convenience": scoring_for_versatile_vs_convenience,
+}
 
-# starts off by just printing a common circuit with common exercises that i made up
-print("Some common exercises for your workout circuit would be: ")
-for exercise in base_exercises:
-    print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
-
-# get input about whether or not they wanna change the original circuit given to them
-userresponse = get_valid_input("Would you like to make any changes to the exercises? (y/n)", ["y", "n"])
-
-# if they wanna change it you can either change equipment type or be asked questions to get the best workout plan you can
-if userresponse == 'y':
-    userresponse2 = get_valid_input("Would you want to change the equipmment type of the exercises or maybe go over some questions to get a better workout plan? (equipment/questions) ", ["equipment", "questions"])
-
-    # change equipment
-    if userresponse2 == 'equipment':
-        userresponse3 = get_valid_input("What type of equipment would you like to use? (machine/dumbbell/cable/bodyweight) ", ["machine", "dumbbell", "cable", "bodyweight"])
-
-        # change to machine workout
-        if userresponse3 == 'machine':
-            print("Here are the machine only exercises: ")
-            for exercise in machine_only_exercises:
-                print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
-
-        # change to dumbbells only circuit
-        elif userresponse3 == 'dumbbell':
-            print("Here are the dumbbell only exercises: ")
-            for exercise in dumbbell_only_exercises:
-                print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
 
-        # cable only workout
-        elif userresponse3 == 'cable':
-            print("Here are the cable only exercises: ")
-            for exercise in cable_only_exercises:
-                print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
+# gives all equipment types
+typesofequipment = ['machine', 'cable', 'dumbbell', 'bodyweight']
 
-        # bodyweight workout
-        elif userresponse3 == 'bodyweight':
-            print("Here are the bodyweight only exercises: ")
-            for exercise in bodyweight_only_exercises:
-                print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
+# every question that goes into useranswers, in the order they get asked: key, prompt, and the answers that are allowed
+questionnaire = [
+    # 1st question, trying to grasp goal of working out
+    ("priority", "What would you say is the most important thing about a workout for you? (Building Balance and Stability while Strengthening, Pure muscle targeting, Consistent Resistance, or Most Cost Effective) ", [
+        "Building Balance and Stability while Strengthening", "Pure muscle targeting", "Consistent Resistance", "Most Cost Effective"
+    ]),
 
-    # if you pick questions, gives questions to answer to get input for best circuit
-    elif userresponse2 == 'questions':
+    # 2nd question, getting experience in the gym (determines what type of equipment would best suit needs)
+    ("experience", "How new are you to the gym? (Beginner, Intermediate, or Advanced) ", ["Beginner", "Intermediate", "Advanced"]),
 
-        # print questions
-        print("Here are the questions: ")
+    # 3rd question grasp if they have had injuries before or if they need options that lessen chance of injury
+    ("injury_prone", "Are you injury prone/Want a safe option when working out? (y/n)", ["y", "n"]),
 
+    # 4th question see what goal is can determine best equipment
+    ("goal", "What is your goal? (Strength, Hypertrophy, or Endurance) ", ["Strength", "Hypertrophy", "Endurance"]),
 
-        # 1st question, trying to grasp goal of working out
-        userresponse4 = get_valid_input("What would you say is the most important thing about a workout for you? (Building Balance and Stability while Strengthening, Pure muscle targeting, Consistent Resistance, or Most Cost Effective) ", [
-            "Building Balance and Stability while Strengthening", "Pure muscle targeting", "Consistent Resistance", "Most Cost Effective"
-        ])
+    # 5th question determines equipment options 
+    ("limited_weight", "How limited are your weight options? (Limited, Moderate, or Unlimited) ", ["Limited", "Moderate", "Unlimited"]),
 
-        
-        # 2nd question, getting experience in the gym (determines what type of equipment would best suit needs)
-        userresponse5 = get_valid_input("How new are you to the gym? (Beginner, Intermediate, or Advanced) ", ["Beginner", "Intermediate", "Advanced"])
+    # 6th question can really determine whether to go for dumbbells machine cable or bodyweight
+    ("home_gym", "Do you want to work out at home or at the gym? (Home/Gym) ", ["Home", "Gym"]),
 
-        # 3rd question grasp if they have had injuries before or if they need options that lessen chance of injury
-        userresponse6 = get_valid_input("Are you injury prone/Want a safe option when working out? (y/n)", ["y", "n"])
+    # 7th question difference between working out certain parts everyday or everything
+    ("full_body_split", "Do you prefer full-body or split workouts? (Full-Body/Split) ", ["Full-Body", "Split"]),
 
-        # 4th question see what goal is can determine best equipment
-        userresponse7 = get_valid_input("What is your goal? (Strength, Hypertrophy, or Endurance) ", ["Strength", "Hypertrophy", "Endurance"])
+    # 8th question if sports most likely dont wanna bulk too much but still be athletic
+    ("sport", "Are you working out for a sport?(y/n)", ["y", "n"]),
 
-        # 5th question determines equipment options 
-        userresponse8 = get_valid_input("How limited are your weight options? (Limited, Moderate, or Unlimited) ", ["Limited", "Moderate", "Unlimited"])
+    # 9th question determines if they want equipment that can be used for multiople different things or need no setting up
+    ("versatile_vs_convenience", "Do you prefer your workouts to be more convenient or more versatile? (convenient/versatile)", ["convenient", "versatile"]),
+]
 
-        # 6th question can really determine whether to go for dumbbells machine cable or bodyweight
-        userresponse9 = get_valid_input("Do you want to work out at home or at the gym? (Home/Gym) ", ["Home", "Gym"])
+# question keys in order, and the lowercase version of every answer pointing back to how the scoring tables spell it
+question_keys = [question for question, _, _ in questionnaire]
+answer_lookup = {question: {option.lower(): option for option in options} for question, _, options in questionnaire}
+
+
+# where the scoring model file lives by default, right next to this file
+scoring_model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring_model.json")
+
+# one version of the scoring tables, checked once when its loaded and turned into a quick lookup
+# version is the number in the file plus a hash of the tables, so editing the weights without bumping the number still gives a new version
+class ScoringModel:
+    # constructor, tables is question -> answer -> equipment -> score like the scoring dict
+    # best_equipment_for, AnswerTable and PlanCache only know typesofequipment, so equipment (if given) has to be exactly those
+    def __init__(self, tables, number=0, equipment=None):
+        import hashlib
+        import json
+
+        if equipment is not None and (not isinstance(equipment, list) or len(equipment) != len(typesofequipment) or set(equipment) != set(typesofequipment)):
+            raise ValueError(f"scoring model equipment has to be {typesofequipment}, got {equipment!r}")
+        check_scoring_tables(tables, typesofequipment)
+        self.tables = tables
+        self.equipment = list(typesofequipment)
+        digest = hashlib.sha256(json.dumps([number, self.equipment, tables], sort_keys=True).encode()).hexdigest()
+        self.version = f"{number}-{digest[:12]}"
+
+        # question -> answer -> scores for every equipment type in self.equipment order, so scoring answers is just adding tuples
+        self.answer_points = {
+            question: {answer: tuple(answer_scores.get(equipment_type, 0) for equipment_type in self.equipment) for answer, answer_scores in table.items()}
+            for question, table in tables.items()
+        }
 
-        # 7th question difference between working out certain parts everyday or everything
-        userresponse10 = get_valid_input("Do you prefer full-body or split workouts? (Full-Body/Split) ", ["Full-Body", "Split"])
+    # same numbers as equipment_scores(useranswers, self.tables), every equipment type is there even if its 0
+    # counted under the same name as the function in PlannerMetrics since its the same stage of a plan
+    def equipment_scores(self, useranswers):
+        metrics = planner_metrics
+        if metrics is not None:
+            start = time.perf_counter()
 
-        # 8th question if sports most likely dont wanna bulk too much but still be athletic
-        userresponse11 = get_valid_input("Are you working out for a sport?(y/n)", ["y", "n"])
+        totals = [0] * len(self.equipment)
+        for question, answer in useranswers.items():
+            points = self.answer_points.get(question, {}).get(answer)
+            if points is not None:
+                for slot, score in enumerate(points):
+                    totals[slot] += score
+
+        if metrics is not None:
+            seconds = time.perf_counter() - start
+            metrics.record("equipment_scores", seconds)
+            if metrics.callback is not None:
+                metrics.callback("equipment_scores", {"seconds": seconds})
+        return dict(zip(self.equipment, totals))
+
+    # reads a model file: {"version": n, "equipment": [...], "questions": {question: {answer: {equipment: score}}}}
+    @classmethod
+    def from_file(cls, path):
+        import json
+
+        with open(path) as file:
+            data = json.load(file)
+        if not isinstance(data, dict) or "questions" not in data:
+            raise ValueError(f"{path} is not a scoring model (no questions)")
+        return cls(data["questions"], data.get("version", 0), data.get("equipment"))
+
+# makes sure a set of scoring tables has a row for every answer the questionnaire allows and only scores known equipment with numbers
+def check_scoring_tables(tables, equipment):
+    if not isinstance(tables, dict):
+        raise ValueError("scoring tables have to be a dict of question -> answer -> equipment -> score")
+    for question, _, options in questionnaire:
+        table = tables.get(question)
+        if not isinstance(table, dict):
+            raise ValueError(f"scoring tables are missing the {question} question")
+        for option in options:
+            if option not in table:
+                raise ValueError(f"{question}: no scores for the {option!r} answer")
+        for answer, answer_scores in table.items():
+            if not isinstance(answer_scores, dict):
+                raise ValueError(f"{question}: {answer!r} has to map equipment types to scores")
+            for equipment_type, score in answer_scores.items():
+                if equipment_type not in equipment:
+                    raise ValueError(f"{question}: {answer!r} scores unknown equipment {equipment_type!r}")
+                if isinstance(score, bool) or not isinstance(score, (int, float)):
+                    raise ValueError(f"{question}: {answer!r} {equipment_type} score has to be a number, got {score!r}")
+
+# the model the planner uses: the file if theres one, otherwise the scoring_for_* tables in this file
+def load_scoring_model(path=None):
+    if path is None:
+        path = scoring_model_path
+    if os.path.exists(path):
+        return ScoringModel.from_file(path)
+    return ScoringModel(default_scoring_tables)
+
+# keeps the current scoring model for a long running service and swaps in a new one when the file changes, without a restart
+# the file is checked at most every check_interval seconds (or by a watcher thread), a broken file is reported in last_error and the old model stays
+# anything cached from a model should be keyed on its version (planner_server.py keys its plan cache on it), so a stale plan is never handed out
+class ScoringModelStore:
+    # constructor
+    def __init__(self, path=None, check_interval=1.0):
+        import threading
+
+        self.path = scoring_model_path if path is None else path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.last_error = None
+        self.stamp = self.file_stamp()
+        self.model = load_scoring_model(self.path)
+        self.checked = time.monotonic()
+
+    # changes whenever the file is rewritten
+    def file_stamp(self):
+        try:
+            info = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return info.st_mtime_ns, info.st_size
+
+    # loads the file again if it changed, gives back True if a new model was swapped in
+    def reload_if_changed(self):
+        with self.lock:
+            self.checked = time.monotonic()
+            stamp = self.file_stamp()
+            if stamp == self.stamp:
+                return False
+            try:
+                model = load_scoring_model(self.path)
+            except (OSError, ValueError) as error:
+                self.last_error = error
+                return False
+            self.stamp = stamp
+            self.last_error = None
+            if model.version == self.model.version:
+                return False
+            self.model = model
+            return True
+
+    # the model to use right now, a caller should grab this once and use it for the whole request
+    def current(self):
+        if time.monotonic() - self.checked >= self.check_interval:
+            self.reload_if_changed()
+        return self.model
+
+    # checks the file every interval seconds on a background thread until stop is set
+    def watch(self, interval=1.0):
+        import threading
+
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                self.reload_if_changed()
+
+        threading.Thread(target=loop, name="scoring-model-watcher", daemon=True).start()
+        return stop
+
+
+# the exercise lists and the merged scoring dict, built the first time something needs them instead of at import so importing this file stays cheap
+class PlannerCore:
+    # constructor
+    def __init__(self):
+
+        # these are some base exercises that I could think of, basically a base circuit anyone can do with the name of the exercise, the muscle group that it targets, and the type of equipment that is used
+        self.base_exercises = [
+            BaseExercise("Bench Press", "chest", "barbell"),
+            BaseExercise("Bicep Curl", "biceps", "dumbbell"),
+            BaseExercise("Tricep Pushdowns", "triceps", "machine"),
+            BaseExercise("Overhead Press", "shoulders", "dumbbell"),
+            BaseExercise("Squats", "legs", "barbell"),
+            BaseExercise("Deadlifts", "legs", "barbell"),
+            BaseExercise("Barbell Rows", "back", "barbell"),
+        ]
+
+        # if asked for a machine only workout, these are some exercises that I could think of that are machine only, showing name, muscle group it targets, and machine only equipment
+        self.machine_only_exercises = [
+            BaseExercise("Chest Press Machine", "chest", "machine"),
+            BaseExercise("Seated Bicep Curls", "biceps", "machine"),
+            BaseExercise("Tricep Pushdown", "triceps", "machine"),
+            BaseExercise("Seated Machine Shoulder Presses", "shoulders", "machine"),
+            BaseExercise("Leg Press Machine", "legs", "machine"), 
+            BaseExercise("Machine Rows", "back", "machine"), 
+        ] 
+
+        # if asked for a dumbbel only workout, do usual, only dumbbell equipment and hits every muscle group needed (planning to try and implement more things for leg since its so much)
+        self.dumbbell_only_exercises = [ 
+            BaseExercise("Dumbbell Bench Press", "chest", "dumbbell"), 
+            BaseExercise("Bicep Curls", "biceps", "dumbbell"), 
+            BaseExercise("Dumbbell Skull Crushers", "triceps", "dumbbell"), 
+            BaseExercise("Lateral Raises", "shoulders", "dumbbell"), 
+            BaseExercise("Squats", "legs", "dumbbell"), 
+            BaseExercise("Deadlifts", "legs", "dumbbell"),
+            BaseExercise("Bent Over Dumbbell Rows", "back", "dumbbell"),
+        ]
+
+        # Cable only exercises, hits all muscle groups (free to change want more input)
+        self.cable_only_exercises = [
+            BaseExercise("Cable Chest Press", "chest", "cable"),
+            BaseExercise("Cable Bicep Curls", "biceps", "cable"),
+            BaseExercise("Cable Tricep Pushdowns", "triceps", "cable"),
+            BaseExercise("Cable Shoulder Press", "shoulders", "cable"),
+            BaseExercise("Cable Squats", "legs", "cable"),
+            BaseExercise("Cable RDL", "legs", "cable"),
+            BaseExercise("Seated Cable Rows", "back", "cable"),
+        ]
+
+        # bodyweight only, hits all parts (lowkey could not think of other exercises might edit later if given more input)
+        self.bodyweight_only_exercises = [
+            BaseExercise("Pushups", "chest", "bodyweight"),
+            BaseExercise("Chin ups", "biceps", "bodyweight"),
+            BaseExercise("Bench Dips", "triceps", "bodyweight"),
+            BaseExercise("Pike Pushups", "shoulders", "bodyweight"),
+            BaseExercise("Lunges", "legs", "bodyweight"),
+            BaseExercise("Pullups", "back", "bodyweight"),
+        ]
+
+        # puts scores into dictionary, from scoring_model.json if its there (its checked once here) or the scoring_for_* tables if not
+        self.scoring_model = load_scoring_model()
+        self.scoring = self.scoring_model.tables
 
-        # 9th question determines if they want equipment that can be used for multiople different things or need no setting up
-        userresponse12 = get_valid_input("Do you prefer your workouts to be more convenient or more versatile? (convenient/versatile)", ["convenient", "versatile"])
+        # gets all exercises together
+        self.allexercises = self.machine_only_exercises + self.dumbbell_only_exercises + self.cable_only_exercises + self.bodyweight_only_exercises
 
-        # maps answers from the user to questions
-        useranswers = {
-            "priority": userresponse4,
-            "experience": userresponse5,
-            "injury_prone": userresponse6,
-            "goal": userresponse7,
-            "limited_weight": userresponse8,
-            "home_gym": userresponse9,
-            "full_body_split": userresponse10,
-            "sport": userresponse11,
-            "versatile_vs_convenience": userresponse12,
-        }
+        # same exercises in the same order, but with the muscle group and equipment indexes already built
+        self.catalog = ExerciseCatalog(self.allexercises)
 
-        # gets all exercises together
-        allexercises = machine_only_exercises + dumbbell_only_exercises + cable_only_exercises + bodyweight_only_exercises
-
-        # gives all equipment types
-        typesofequipment = ['machine', 'cable', 'dumbbell', 'bodyweight']
-        total_points = {equipment: 0 for equipment in typesofequipment}
-
-        # puts scores into dictionary
-        scoring = {
-            "priority": scoring_for_priority,
-            "experience": scoring_for_experience,
-            "injury_prone": scoring_for_injury_prone,
-            "goal": scoring_for_goal,
-            "limited_weight": scoring_for_limited_weight,
-            "home_gym": scoring_for_home_gym,
-            "full_body_split": scoring_for_full_body_split,
-            "sport": scoring_for_sport,
-            "versatile_vs_convenience": scoring_for_versatile_vs_convenience,
+        self.equipment_to_exercises = {
+            "machine": self.machine_only_exercises,
+            "dumbbell": self.dumbbell_only_exercises,
+            "cable": self.cable_only_exercises,
+            "bodyweight": self.bodyweight_only_exercises,
         }
 
-        # goes through answers, adding scores to total
-        for question, answer in useranswers.items():
-
-            # gets scoring
-            scoring_dictionary = scoring.get(question, {})
+# builds the planner core once and hands the same one back after that
+@lru_cache(maxsize=None)
+def planner_core():
+    return PlannerCore()
+
+# lets workout_planner.allexercises, workout_planner.scoring and the exercise lists keep working from outside, built on first use
+def __getattr__(name):
+    if name in ("base_exercises", "machine_only_exercises", "dumbbell_only_exercises", "cable_only_exercises",
+                "bodyweight_only_exercises", "allexercises", "catalog", "equipment_to_exercises", "scoring"):
+        return getattr(planner_core(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# how long a fresh python takes to import this file, best of a few runs in milliseconds (a new process each time so nothing is cached)
+# compiles the file first so its measuring the import a service would see, not the one time .pyc build
+def measure_import_time(runs=5):
+    import py_compile
+    import subprocess
+
+    py_compile.compile(os.path.abspath(__file__))
+    code = "import time; start = time.perf_counter(); import workout_planner; print((time.perf_counter() - start) * 1000)"
+    folder = os.path.dirname(os.path.abspath(__file__))
+    return min(
+        float(subprocess.run([sys.executable, "-c", code], cwd=folder, capture_output=True, text=True, check=True).stdout)
+        for _ in range(runs)
+    )
+
+# importing this file from a service should stay under this many milliseconds
+import_time_budget_ms = 20
+
+
+# runs the planner from the command line, asks the questions unless one of the bulk options is given
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # argparse is only needed here, so importing this file doesnt pay for it
+    import argparse
+
+    parser = argparse.ArgumentParser(description="workout planner, asks the questionnaire when run without options")
+
+    # bulk mode: python workout_planner.py --batch answers.jsonl (or answers.csv) prints one plan per line instead of asking questions
+    # --catalog exercises.csv (or .jsonl) plans from an exercise export instead of the built in exercises
+    # --cache plans.sqlite3 keeps every plan in a PlanCache file so the next run doesnt have to work them out again
+    parser.add_argument("--batch", metavar="ANSWERS", help="plan every set of answers in a .jsonl or .csv file and print one plan per line")
+    parser.add_argument("--catalog", metavar="EXERCISES", help="with --batch, plan from an exercise export (.csv or .jsonl) instead of the built in exercises")
+    parser.add_argument("--cache", metavar="PLANS", help="with --batch, keep every plan in this PlanCache file")
+
+    # python workout_planner.py --build-table [path] works out every possible set of answers ahead of time
+    parser.add_argument("--build-table", nargs="?", const="", metavar="PATH", help="work out every possible set of answers and save them (default: answer_table.bin)")
+
+    # python workout_planner.py --check-import-time fails if importing got slower than the budget
+    parser.add_argument("--check-import-time", action="store_true", help=f"exit 1 if importing workout_planner takes longer than {import_time_budget_ms} ms")
+
+    # anything unknown or mixed up exits with an error instead of falling through to the questionnaire
+    args = parser.parse_args(argv)
+    modes = [mode for mode in (args.batch, args.build_table) if mode is not None] + ([True] if args.check_import_time else [])
+    if len(modes) > 1:
+        parser.error("--batch, --build-table and --check-import-time cant be used together")
+    if args.batch is None and (args.catalog is not None or args.cache is not None):
+        parser.error("--catalog and --cache only work with --batch")
+
+    if args.batch is not None:
+        import json
+        exercises = load_exercise_file(args.catalog) if args.catalog is not None else planner_core().catalog
+        cache = PlanCache(args.cache, exercises) if args.cache is not None else None
+
+        # same plan shows up a lot, so only turn each one into json once
+        printed = {}
+        try:
+            for plan in recommend_many(load_profiles(args.batch), exercises, cache=cache):
+                line = printed.get(id(plan))
+                if line is None:
+                    line = printed[id(plan)] = json.dumps(plan_to_dict(plan))
+                print(line)
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
+    if args.build_table is not None:
+        build_answer_table(args.build_table or None)
+        return
+
+    if args.check_import_time:
+        took = measure_import_time()
+        print(f"importing workout_planner took {took:.1f} ms (budget {import_time_budget_ms} ms)")
+        if took > import_time_budget_ms:
+            sys.exit(1)
+        return
+
+    # exercise lists and scoring tables, built now since the questionnaire needs them
+    core = planner_core()
+    base_exercises = core.base_exercises
+    machine_only_exercises = core.machine_only_exercises
+    dumbbell_only_exercises = core.dumbbell_only_exercises
+    cable_only_exercises = core.cable_only_exercises
+    bodyweight_only_exercises = core.bodyweight_only_exercises
+    allexercises = core.catalog
+    equipment_to_exercises = core.equipment_to_exercises
+    scoring = core.scoring
+
+    # starts off by just printing a common circuit with common exercises that i made up
+    print("Some common exercises for your workout circuit would be: ")
+    for exercise in base_exercises:
+        print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
+
+    # get input about whether or not they wanna change the original circuit given to them
+    userresponse = get_valid_input("Would you like to make any changes to the exercises? (y/n)", ["y", "n"])
+
+    # if they wanna change it you can either change equipment type or be asked questions to get the best workout plan you can
+    if userresponse == 'y':
+        userresponse2 = get_valid_input("Would you want to change the equipmment type of the exercises or maybe go over some questions to get a better workout plan? (equipment/questions) ", ["equipment", "questions"])
+
+        # change equipment
+        if userresponse2 == 'equipment':
+            userresponse3 = get_valid_input("What type of equipment would you like to use? (machine/dumbbell/cable/bodyweight) ", ["machine", "dumbbell", "cable", "bodyweight"])
+
+            # change to machine workout
+            if userresponse3 == 'machine':
+                print("Here are the machine only exercises: ")
+                for exercise in machine_only_exercises:
+                    print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
+
+            # change to dumbbells only circuit
+            elif userresponse3 == 'dumbbell':
+                print("Here are the dumbbell only exercises: ")
+                for exercise in dumbbell_only_exercises:
+                    print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
+
+            # cable only workout
+            elif userresponse3 == 'cable':
+                print("Here are the cable only exercises: ")
+                for exercise in cable_only_exercises:
+                    print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
+
+            # bodyweight workout
+            elif userresponse3 == 'bodyweight':
+                print("Here are the bodyweight only exercises: ")
+                for exercise in bodyweight_only_exercises:
+                    print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
+
+        # if you pick questions, gives questions to answer to get input for best circuit
+        elif userresponse2 == 'questions':
+
+            # print questions
+            print("Here are the questions: ")
+
+
+            # asks every question and maps answers from the user to questions
+            useranswers = {}
+            for question, prompt, options in questionnaire:
+                useranswers[question] = get_valid_input(prompt, options)
+
+            # get_valid_input gives back lowercase, the scoring tables (and --batch, the server and the caches) use the questionnaire's spelling
+            useranswers = normalize_answers(useranswers)
+
+            # scores the answers once, every equipment type and exercise reads from this
+            equipment_points = equipment_scores(useranswers, scoring)
+            exercise_scores = exercise_score_array(allexercises, equipment_points)
+
+            # gets best equipment based on points
+            best_equipment = best_equipment_for(equipment_points)
+
+            # prints best equipment type
+            print(f"\nBased on your answers, the best equipment type is: {best_equipment}\n")
+
+            # gives exercises for each muscle group for the best equipment
+            print("Here are some recommended exercises for you:")
+            recommended_exercises = equipment_to_exercises.get(best_equipment, [])
+            for exercise in recommended_exercises:
+                print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
 
-            # gets scores for equipment types based on answer
-            scores_for_answer = scoring_dictionary.get(answer, {})
 
-            # add scores to total
-            for equipment, score in scores_for_answer.items():
-                total_points[equipment] += score
+            # asking for better customization
+            bettercustomization = get_valid_input("Would you like to further customize your workout plan? (y/n)", ["y", "n"])
+
+            # if they want better customization this is where you utilize the dp function to get best circuit
+            if bettercustomization == 'y':
+                print("Here are the exercises with mixed equipment not just the best equipment type: ")
+                mixed_circuit = optimalcircuitwithcounts(allexercises, useranswers, scoring, exercise_scores)
+
+                # prints with numbers so you can check which one you want an alternate exercise from
+                for idx, exercise in enumerate(mixed_circuit):
+                    print(f"{idx + 1}. {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
+
+                # asking for replacement
+                wants_change = get_valid_input("Would you like to replace any of these exercises? (y/n)", ["y", "n"])
+
+                # if they want a change, pick number of exercise you wanna change and picks second best
+                if wants_change == 'y':
+
+                    # ranked alternatives for these answers, everything already in the circuit counts as used
+                    alternatives = RankedAlternatives(allexercises, exercise_scores)
+                    for exercise in mixed_circuit:
+                        alternatives.mark_used(exercise)
+
+                    # loop until no replacement wanted
+                    while True:
+                        try:
+                            # ask which you wanna replace with number
+                            choice = int(input("Enter the number of the exercise you want to replace (1-{}), or 0 to stop: ".format(len(mixed_circuit))))
+                            # if 0 stop
+                            if choice == 0:
+                                break
+                            # if number than replace with second best
+                            if 1 <= choice <= len(mixed_circuit):
+                                original = mixed_circuit[choice - 1]
+                                second_best = alternatives.next_alternative(original.muscle_group)
+                                if second_best:
+                                    mixed_circuit[choice - 1] = second_best
+                                    print(f"Replaced with: {second_best.name} ({second_best.muscle_group}) - Equipment: {second_best.equipment_type}")
+
+                                # no replacement found
+                                else:
+                                    print("No alternative found for that muscle group.")
+
+                            # not in range
+                            else:
+                                print("Invalid choice.")
+                        # ask again if not in range or not number
+                        except ValueError:
+                            print("Please enter a number.")
 
-        # gets best equipment based on points
-        best_equipment = max(total_points, key=total_points.get)
+                print("\nFinal customized circuit:")
+                for ex in mixed_circuit:
+                    print(f"- {ex.name} ({ex.muscle_group}) - Equipment: {ex.equipment_type}")
 
-        equipment_to_exercises = {
-            "machine": machine_only_exercises,
-            "dumbbell": dumbbell_only_exercises,
-            "cable": cable_only_exercises,
-            "bodyweight": bodyweight_only_exercises,
-        }
+            else:
+                print("Great! Remember, strict form only!")
 
-        # prints best equipment type
-        print(f"\nBased on your answers, the best equipment type is: {best_equipment}\n")
-
-        # gives exercises for each muscle group for the best equipment
-        print("Here are some recommended exercises for you:")
-        recommended_exercises = equipment_to_exercises.get(best_equipment, [])
-        for exercise in recommended_exercises:
-            print(f"- {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
-
-
-        # asking for better customization
-        bettercustomization = get_valid_input("Would you like to further customize your workout plan? (y/n)", ["y", "n"])
-
-        # if they want better customization this is where you utilize the dp function to get best circuit
-        if bettercustomization == 'y':
-            print("Here are the exercises with mixed equipment not just the best equipment type: ")
-            mixed_circuit = optimalcircuitwithdp(allexercises, useranswers, scoring)
-
-            # prints with numbers so you can check which one you want an alternate exercise from
-            for idx, exercise in enumerate(mixed_circuit):
-                print(f"{idx + 1}. {exercise.name} ({exercise.muscle_group}) - Equipment: {exercise.equipment_type}")
-
-            # asking for replacement
-            wants_change = get_valid_input("Would you like to replace any of these exercises? (y/n)", ["y", "n"])
-
-            # if they want a change, pick number of exercise you wanna change and picks second best
-            if wants_change == 'y':
-
-                # loop until no replacement wanted
-                while True:
-                    try:
-                        # ask which you wanna replace with number
-                        choice = int(input("Enter the number of the exercise you want to replace (1-{}), or 0 to stop: ".format(len(mixed_circuit))))
-                        # if 0 stop
-                        if choice == 0:
-                            break
-                        # if number than replace with second best
-                        if 1 <= choice <= len(mixed_circuit):
-                            original = mixed_circuit[choice - 1]
-                            second_best = get_second_best(allexercises, useranswers, scoring, original.muscle_group, original.name)
-                            if second_best:
-                                mixed_circuit[choice - 1] = second_best
-                                print(f"Replaced with: {second_best.name} ({second_best.muscle_group}) - Equipment: {second_best.equipment_type}")
-
-                            # no replacement found
-                            else:
-                                print("No alternative found for that muscle group.")
-                        
-                        # not in range
-                        else:
-                            print("Invalid choice.")
-                    # ask again if not in range or not number
-                    except ValueError:
-                        print("Please enter a number.")
-
-            print("\nFinal customized circuit:")
-            for ex in mixed_circuit:
-                print(f"- {ex.name} ({ex.muscle_group}) - Equipment: {ex.equipment_type}")
+    else:
+        print("Great! Remember, strict form only!")
 
-        else:
-            print("Great! Remember, strict form only!")
 
-else:
-    print("Great! Remember, strict form only!")
+if __name__ == "__main__":
+    main()